@@ -0,0 +1,7 @@
+"""
+Loads .env into the environment once per process. Modules that read settings with
+os.getenv at import time import this first; later imports are free.
+"""
+from dotenv import load_dotenv
+
+load_dotenv()
@@ -1,23 +1,34 @@
 import os
+import json
+import hmac
 from typing import Optional, Tuple
+import threading
 from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import HTMLResponse, StreamingResponse
+from fastapi.responses import HTMLResponse, StreamingResponse, RedirectResponse, PlainTextResponse, JSONResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from starlette.middleware.cors import CORSMiddleware
-from dotenv import load_dotenv
+from starlette.concurrency import run_in_threadpool
 
-# Load environment variables from .env file
-load_dotenv()
-
-from app.services.prompts import compose_prompt, prompt_hash
-from app.services.jobs import JobStore, JobRecord
+import app.config  # noqa: F401  (loads .env before any setting is read)
+from app.services.jobs import JobRecord, INFLIGHT_STATUSES, build_job_store
+from app.services.prompts import STYLE_PRESETS
 from app.services.video_generator import VideoGenerator
-from app.services.prompt_optimizer import optimize_prompt
-from app.services.feedback import save_feedback
+from app.services.scheduler import QueueFull
+from app.services import webhooks, job_tokens
+from app.services.video_cache import build_video_cache
+from app.services.video_response import VideoFileResponse
+from app.services.static_assets import static_assets, IMMUTABLE, REVALIDATE
+from app.services.prompt_optimizer import optimize_prompt, optimize_prompts, cache_stats as optimizer_cache_stats
+from app.services.feedback import save_feedback, feedback_store
+from app.services.metrics import registry
+from app.services.timing import ServerTimingMiddleware, loop_lag, span
+from app.services import profiler
 
 APP_ORIGIN = os.getenv("APP_ORIGIN", "*")
-PROVIDER_NAME = os.getenv("VIDEO_PROVIDER", "replicate").lower()
+OPTIMIZE_BATCH_MAX_ITEMS = int(os.getenv("OPTIMIZE_BATCH_MAX_ITEMS", "500"))
+GENERATE_BATCH_MAX_ITEMS = int(os.getenv("GENERATE_BATCH_MAX_ITEMS", "100"))
+STATUS_LONG_POLL_TIMEOUT = float(os.getenv("STATUS_LONG_POLL_TIMEOUT", "25"))  # max seconds /status?since= holds
 
 app = FastAPI(title="Peppo AI – Video Generator", version="1.2")
 
@@ -29,19 +40,110 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(ServerTimingMiddleware)
+
 templates = Jinja2Templates(directory="app/templates")
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
-job_store = JobStore()
-video_gen = VideoGenerator(PROVIDER_NAME)  # 👈 central entrypoint
+job_store = build_job_store()
+video_gen = VideoGenerator(store=job_store, video_cache=build_video_cache())  # 👈 central entrypoint
+
+# State gauges are computed when /metrics is scraped, so request handling pays nothing for them
+registry.callback("peppo_scheduler_queue_depth", "Jobs waiting to be submitted",
+                  lambda: [((p,), video_gen.scheduler.stats(p)["depth"]) for p in video_gen.providers], ("provider",))
+registry.callback("peppo_provider_inflight_jobs", "Jobs generating upstream, submitted by this process",
+                  lambda: [((p,), video_gen.scheduler.stats(p)["inflight"]) for p in video_gen.providers], ("provider",))
+registry.callback("peppo_job_store_size", "Records in the job store",
+                  lambda: [((k,), v) for k, v in job_store.stats().items()], ("kind",))
+registry.callback("peppo_generations_saved_total", "Generations avoided by reusing another job",
+                  lambda: [((k,), v) for k, v in video_gen.savings.items()], ("reason",), kind="counter")
+registry.callback("peppo_near_duplicate_index_size", "Prompts in the near-duplicate index",
+                  lambda: len(video_gen.near_dups) if video_gen.near_dups is not None else 0)
+registry.callback("peppo_optimizer_cache_size", "Memoized prompt optimizations",
+                  lambda: optimizer_cache_stats()["size"])
+if video_gen.video_cache:
+    registry.callback("peppo_video_cache_bytes", "Bytes held by the local video mirror",
+                      lambda: video_gen.video_cache.stats()["bytes"])
+    registry.callback("peppo_video_cache_files", "Videos held by the local video mirror",
+                      lambda: video_gen.video_cache.stats()["files"])
+
+registry.callback("peppo_event_loop_lag_seconds", "Worst event-loop lag over the last ~10s",
+                  lambda: loop_lag.peak)
+
+@app.on_event("startup")
+async def startup():
+    static_assets.build()
+    _index_page()
+    loop_lag.start()
+    video_gen.start()
+    await feedback_store.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await loop_lag.stop()
+    await video_gen.aclose()
+    await feedback_store.stop()
+    job_store.close()
 
 @app.get("/healthz")
 def healthz():
-    return {"ok": True, "provider": PROVIDER_NAME}
+    return {
+        "ok": True,
+        "provider": video_gen.provider_name,
+        "providers": video_gen.router.snapshot(),
+        "polling": {**video_gen.poll_stats, "eta": video_gen.eta.snapshot()},
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus text exposition of the in-process metrics registry."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/admin/profile", response_class=PlainTextResponse)
+async def admin_profile(request: Request, seconds: float = 5.0, interval: float = 0.005, loop_only: bool = False):
+    """
+    Sample the live process for `seconds` and return collapsed stacks for a flamegraph.
+    Requires ADMIN_TOKEN (X-Admin-Token header); `loop_only` samples just the event-loop thread.
+    """
+    if not profiler.ADMIN_TOKEN:
+        raise HTTPException(404, "Not Found")
+    if not hmac.compare_digest(request.headers.get("x-admin-token", ""), profiler.ADMIN_TOKEN):
+        raise HTTPException(403, "Forbidden")
+    if not 0.001 <= interval <= 1.0:
+        raise HTTPException(400, "interval must be between 0.001 and 1 seconds")
+
+    loop_thread = threading.get_ident()  # this handler runs on the event loop
+    try:
+        stacks = await run_in_threadpool(profiler.sample, seconds, interval, loop_thread if loop_only else None)
+    except profiler.ProfilerBusy as e:
+        raise HTTPException(409, str(e))
+    return PlainTextResponse(stacks)
+
+@app.get("/cache/stats")
+def cache_stats():
+    """Generations avoided by exact, near-duplicate and in-flight reuse."""
+    return {
+        "saved_generations": sum(video_gen.savings.values()),
+        "by_reason": dict(video_gen.savings),
+        "near_duplicate_index": len(video_gen.near_dups) if video_gen.near_dups is not None else None,
+        "prompt_optimizer": optimizer_cache_stats(),
+    }
+
+def _index_page():
+    # Rendered once; the page only changes with a deploy
+    return static_assets.page("index.html", lambda: templates.get_template("index.html").render(asset=static_assets.url))
 
 @app.get("/", response_class=HTMLResponse)
 def index(request: Request):
-    return templates.TemplateResponse("index.html", {"request": request})
+    return _index_page().response(request.headers, REVALIDATE)
+
+@app.get("/assets/{name}")
+def asset(name: str, request: Request):
+    """Fingerprinted, precompressed static assets; a stale fingerprint gets the current file, uncached."""
+    found, current = static_assets.lookup(name)
+    if found is None:
+        raise HTTPException(404, "Asset not found")
+    return found.response(request.headers, IMMUTABLE if current else REVALIDATE)
 
 @app.post("/generate")
 async def generate(payload: dict):
@@ -50,113 +152,252 @@ async def generate(payload: dict):
     if not user_prompt:
         raise HTTPException(400, "Prompt is required")
 
-    h = prompt_hash(user_prompt, style)
-    cached = job_store.get_by_hash(h)
-    if cached and cached.status == "succeeded":
-        return {
-            "job_id": cached.job_id,
+    try:
+        rec = await video_gen.asubmit(user_prompt, style)
+    except QueueFull as e:
+        raise _busy(e)
+    if job_tokens.enabled():
+        # Let the job reach its provider, so the response carries a token any worker can resolve
+        rec = await video_gen.wait_submitted(rec, job_tokens.JOB_TOKEN_WAIT)
+    if rec.status == "succeeded":
+        return _with_token({
+            "job_id": rec.job_id,
             "status": "succeeded",
-            "video_url": cached.video_path,
-            "cached": True
-        }
-
-    final_prompt = compose_prompt(user_prompt, style)
-    job = video_gen.submit(final_prompt, style=style)
-
-    rec = JobRecord(
-        job_id=job.job_id,
-        status=job.status,
-        video_path=None,
-        provider=PROVIDER_NAME,
-        prompt_hash=h
-    )
-    job_store.put(rec)
-    return {"job_id": job.job_id, "status": job.status, "cached": False}
+            "video_url": rec.video_path,
+            "cached": True,
+            "version": rec.version,
+        }, rec)
 
-@app.get("/status/{job_id}")
-async def status(job_id: str):
-    pj = video_gen.fetch(job_id)
-    rec = job_store.get(job_id)
-    if not rec:
-        raise HTTPException(404, "Job not found")
+    if rec.status == "failed":
+        return {"job_id": rec.job_id, "status": "failed", "error": rec.meta.get("error"), "cached": False}
 
-    rec.status = pj.status
-    if pj.status == "succeeded" and not rec.video_path:
-        rec.video_path = f"/video/{job_id}"
-        if pj.video_url:
-            rec.meta["provider_output_url"] = pj.video_url
+    return _with_token({"job_id": rec.job_id, "status": rec.status, "cached": False, "version": rec.version}, rec)
 
-    if pj.error:
-        return {"job_id": job_id, "status": "failed", "error": pj.error}
+def _with_token(payload: dict, rec: JobRecord) -> dict:
+    token = video_gen.token_for(rec)
+    if token:
+        payload["job_token"] = token
+    return payload
 
-    return {
-        "job_id": job_id,
+def _lookup(job_id: str) -> Tuple[Optional[JobRecord], Optional[job_tokens.JobToken]]:
+    """
+    A job id or a job token -> (stored record if this worker can see it, decoded token).
+    A valid token with no local record is answered by asking its provider directly.
+    """
+    if not job_tokens.is_token(job_id):
+        return job_store.get(job_id), None
+    tok = job_tokens.decode(job_id)
+    return (video_gen.resolve_token(tok) if tok else None), tok
+
+def _busy(e: QueueFull) -> HTTPException:
+    """503 with a Retry-After hint: shed load instead of queueing without bound."""
+    return HTTPException(503, "Too many pending generations, retry later",
+                         headers={"Retry-After": str(int(e.retry_after + 0.999))})
+
+def _status_payload(rec: JobRecord) -> dict:
+    if rec.status == "failed":
+        return {"job_id": rec.job_id, "status": "failed", "error": rec.meta.get("error"), "version": rec.version}
+
+    payload = {
+        "job_id": rec.job_id,
         "status": rec.status,
         "video_url": rec.video_path,
-        "cached": rec.cached
+        "cached": rec.cached,
+        "version": rec.version,
     }
+    queue = video_gen.queue_info(rec)
+    if queue:
+        payload["queue"] = queue
+    elif "queue_wait_ms" in rec.meta:
+        payload["queue_wait_ms"] = int(rec.meta["queue_wait_ms"])
+    eta = video_gen.eta_remaining(rec)
+    if eta is not None:
+        payload["eta_s"] = round(eta, 1)
+    return _with_token(payload, rec)
+
+def _token_payload(token: str, pj) -> dict:
+    """/status payload built from the provider's answer for a token no local record matches."""
+    if pj.status == "not_found":
+        raise HTTPException(404, "Job not found")
+    if pj.transient:
+        raise HTTPException(503, "Provider unavailable, retry later", headers={"Retry-After": "5"})
+    if pj.error or pj.status == "failed":
+        return {"job_id": token, "status": "failed", "error": pj.error}
+    return {
+        "job_id": token,
+        "status": pj.status,
+        "video_url": f"/video/{token}" if pj.status == "succeeded" else None,
+        "cached": False,
+        "job_token": token,
+    }
+
+@app.post("/generate/batch")
+async def generate_batch(payload: dict):
+    """
+    Submit many generations as one group:
+    {"items": [{"prompt": ..., "style": ...} | {"prompt": ..., "styles": [...] | "all"}, ...]}
+    """
+    items = payload.get("items")
+    if not isinstance(items, list) or not items:
+        raise HTTPException(400, "items must be a non-empty list")
+
+    pairs = []
+    for item in items:
+        item = item if isinstance(item, dict) else {}
+        user_prompt = (item.get("prompt") or "").strip()
+        if not user_prompt:
+            raise HTTPException(400, "Every item needs a prompt")
+        pairs.extend((user_prompt, st) for st in _item_styles(item))
+    if len(pairs) > GENERATE_BATCH_MAX_ITEMS:
+        raise HTTPException(400, f"At most {GENERATE_BATCH_MAX_ITEMS} generations per batch")
 
-def _parse_range(range_header: Optional[str], file_size: int) -> Optional[Tuple[int,int]]:
-    if not range_header or "=" not in range_header:
-        return None
-    units, rng = range_header.split("=", 1)
-    if units.strip().lower() != "bytes":
-        return None
-    start_s, _, end_s = rng.partition("-")
     try:
-        if start_s and end_s:
-            start, end = int(start_s), int(end_s)
-        elif start_s:
-            start, end = int(start_s), file_size - 1
-        else:
-            n = int(end_s)
-            start, end = file_size - n, file_size - 1
-        if start < 0 or end >= file_size or start > end:
-            return None
-        return (start, end)
+        group_id, recs = await video_gen.submit_group(pairs)
+    except QueueFull as e:
+        raise _busy(e)
+    return _group_payload(group_id, recs)
+
+def _item_styles(item: dict) -> list:
+    """A batch item's styles: "styles" as a list, one name or "all", else "style"; 400 on anything unknown."""
+    styles = item.get("styles") or [item.get("style") or "cinematic"]
+    if isinstance(styles, str):
+        styles = list(STYLE_PRESETS) if styles.strip().lower() == "all" else [styles]
+    if not isinstance(styles, list) or not all(isinstance(st, str) for st in styles):
+        raise HTTPException(400, 'styles must be a list of style names or "all"')
+    styles = [st.strip().lower() for st in styles]
+    unknown = sorted(set(styles) - set(STYLE_PRESETS))
+    if unknown:
+        raise HTTPException(400, f"Unknown style {', '.join(unknown)}; expected one of {', '.join(STYLE_PRESETS)}")
+    return styles
+
+def _group_payload(group_id: str, recs: list) -> dict:
+    counts = {}
+    entries = []
+    for i, rec in enumerate(recs):
+        if rec is None:
+            entries.append({"index": i, "status": "not_found"})
+            counts["not_found"] = counts.get("not_found", 0) + 1
+            continue
+        entries.append({"index": i, **_status_payload(rec)})
+        counts[rec.status] = counts.get(rec.status, 0) + 1
+    done = sum(n for st, n in counts.items() if st not in INFLIGHT_STATUSES)
+    return {
+        "group_id": group_id,
+        "items": entries,
+        "total": len(recs),
+        "counts": counts,
+        "progress": done / len(recs) if recs else 1.0,
+        "done": done == len(recs),
+    }
+
+@app.get("/status/group/{group_id}")
+async def group_status(group_id: str):
+    job_ids = job_store.get_group(group_id)
+    if job_ids is None:
+        raise HTTPException(404, "Group not found")
+    return _group_payload(group_id, [job_store.get(j) for j in job_ids])
+
+@app.get("/events/group/{group_id}")
+async def group_events(group_id: str):
+    """Server-Sent Events stream of the /status/group payload whenever any member changes."""
+    job_ids = job_store.get_group(group_id)
+    if job_ids is None:
+        raise HTTPException(404, "Group not found")
+
+    async def stream():
+        async for recs in video_gen.watch_group(job_ids):
+            if recs is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield f"event: status\ndata: {json.dumps(_group_payload(group_id, recs))}\n\n"
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(stream(), media_type="text/event-stream", headers=headers)
+
+@app.get("/status/{job_id}")
+async def status(job_id: str, request: Request, since: Optional[int] = None):
+    """
+    Job status. Versioned: the ETag is the record's version, so an unchanged job answers
+    If-None-Match with 304, and `?since=<version>` holds the request until the job moves
+    past that version or STATUS_LONG_POLL_TIMEOUT expires.
+    """
+    # Pure in-memory read: the background poller keeps records fresh
+    rec, tok = _lookup(job_id)
+    if rec:
+        if since is not None and rec.version == since:
+            with span("long_poll"):
+                rec = await video_gen.wait_changed(rec.job_id, since, STATUS_LONG_POLL_TIMEOUT) or rec
+        # weak: the ETA and queue position drift between versions without changing the job
+        etag = f'W/"{rec.version}"'
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        inm = request.headers.get("if-none-match", "")
+        if etag[2:] in (t.strip().removeprefix("W/") for t in inm.split(",")):
+            return Response(status_code=304, headers=headers)
+        return JSONResponse(_status_payload(rec), headers=headers)
+    if not tok:
+        raise HTTPException(404, "Job not found")
+    with span("upstream"):
+        pj = await video_gen.afetch_token(tok)
+    return _token_payload(job_id, pj)
+
+@app.get("/events/{job_id}")
+async def events(job_id: str):
+    """Server-Sent Events stream that pushes the /status payload whenever it changes."""
+    rec, _ = _lookup(job_id)
+    if not rec:
+        # a token from another worker: clients fall back to polling /status
+        raise HTTPException(404, "Job not found")
+    job_id = rec.job_id
+
+    async def stream():
+        async for rec in video_gen.watch(job_id):
+            if rec is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield f"event: status\ndata: {json.dumps(_status_payload(rec))}\n\n"
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(stream(), media_type="text/event-stream", headers=headers)
+
+@app.post("/webhooks/{provider}")
+async def webhook(provider: str, request: Request, job: str = "", sig: str = ""):
+    """Completion callback from a provider; the URL was signed for exactly this job when it was submitted."""
+    body = await request.body()
+    if not webhooks.verify(provider, job, sig, request.headers, body):
+        raise HTTPException(401, "Bad webhook signature")
+    try:
+        payload = json.loads(body)
     except ValueError:
-        return None
+        raise HTTPException(400, "Webhook body must be JSON")
 
-@app.get("/video/{job_id}")
+    rec = video_gen.apply_webhook(provider, job, payload if isinstance(payload, dict) else {})
+    if rec is None:
+        raise HTTPException(404, "Job not found")
+    return {"ok": True, "status": rec.status}
+
+@app.api_route("/video/{job_id}", methods=["GET", "HEAD"])
 def video(job_id: str, request: Request):
-    # Check if we have a generated video from the provider
-    rec = job_store.get(job_id)
-    if rec and rec.status == "succeeded" and rec.meta.get("provider_output_url"):
-        # Redirect to the actual video URL from Replicate
-        from fastapi.responses import RedirectResponse
-        return RedirectResponse(url=rec.meta["provider_output_url"])
-    
+    rec, tok = _lookup(job_id)
+    if rec is None and tok is not None:
+        pj = video_gen.fetch_token(tok)
+        if pj.status == "succeeded" and pj.video_url:
+            return RedirectResponse(url=pj.video_url)
+    if rec and rec.status == "succeeded":
+        # Serve from the local mirror when we have it; content-addressed, so the digest is the ETag
+        local = video_gen.local_video(rec)
+        if local:
+            return VideoFileResponse(local, request.headers, etag=rec.meta["video_sha256"],
+                                     cache_control="public, max-age=86400")
+
+        # Cache miss: redirect to the actual video URL from the provider
+        if rec.meta.get("provider_output_url"):
+            return RedirectResponse(url=rec.meta["provider_output_url"])
+
     # Fallback to placeholder video
     path = "app/static/placeholder.mp4"
     if not os.path.exists(path):
         raise HTTPException(404, "Video missing")
-
-    file_size = os.path.getsize(path)
-    range_header = request.headers.get("range")
-    rng = _parse_range(range_header, file_size)
-
-    def iterfile(start: int = 0, end: int = file_size - 1, chunk_size: int = 64 * 1024):
-        with open(path, "rb") as f:
-            f.seek(start)
-            bytes_left = end - start + 1
-            while bytes_left > 0:
-                chunk = f.read(min(chunk_size, bytes_left))
-                if not chunk:
-                    break
-                bytes_left -= len(chunk)
-                yield chunk
-
-    if rng:
-        start, end = rng
-        headers = {
-            "Content-Range": f"bytes {start}-{end}/{file_size}",
-            "Accept-Ranges": "bytes",
-            "Content-Length": str(end - start + 1),
-        }
-        return StreamingResponse(iterfile(start, end), status_code=206, headers=headers, media_type="video/mp4")
-
-    headers = {"Accept-Ranges": "bytes", "Content-Length": str(file_size)}
-    return StreamingResponse(iterfile(), headers=headers, media_type="video/mp4")
+    return VideoFileResponse(path, request.headers, cache_control="no-cache")
 
 @app.post("/optimize_prompt")
 async def optimize(payload: dict):
@@ -166,9 +407,44 @@ async def optimize(payload: dict):
     if not user_prompt:
         raise HTTPException(400, "Prompt is required")
 
-    optimized = optimize_prompt(user_prompt, style)
+    # The OpenAI SDK blocks; keep it off the event loop
+    with span("optimize"):
+        optimized = await run_in_threadpool(optimize_prompt, user_prompt, style)
     return {"optimized_prompt": optimized}
 
+@app.post("/optimize_prompt/batch")
+async def optimize_batch(payload: dict):
+    """
+    Optimize many prompts at once: {"items": [{"prompt": ..., "style": ...}, ...]}.
+    Streams one NDJSON line per input item as its result becomes ready.
+    """
+    items = payload.get("items")
+    if not isinstance(items, list) or not items:
+        raise HTTPException(400, "items must be a non-empty list")
+    if len(items) > OPTIMIZE_BATCH_MAX_ITEMS:
+        raise HTTPException(400, f"At most {OPTIMIZE_BATCH_MAX_ITEMS} items per batch")
+
+    by_pair = {}
+    errors = []
+    for i, item in enumerate(items):
+        item = item if isinstance(item, dict) else {}
+        user_prompt = (item.get("prompt") or "").strip()
+        style = (item.get("style") or "cinematic").strip().lower()
+        if not user_prompt:
+            errors.append({"index": i, "error": "Prompt is required"})
+            continue
+        by_pair.setdefault((user_prompt, style), []).append(i)
+
+    async def stream():
+        for err in errors:
+            yield json.dumps(err) + "\n"
+        async for (user_prompt, style), optimized in optimize_prompts(by_pair):
+            for i in by_pair[(user_prompt, style)]:
+                line = {"index": i, "prompt": user_prompt, "style": style, "optimized_prompt": optimized}
+                yield json.dumps(line) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
 @app.post("/feedback")
 async def feedback(payload: dict):
     video_id = payload.get("video_id")
@@ -176,6 +452,13 @@ async def feedback(payload: dict):
 
     if not video_id or liked is None:
         raise HTTPException(400, "video_id and liked are required")
+    if isinstance(video_id, bool) or not isinstance(video_id, (str, int, float)):
+        raise HTTPException(400, "video_id must be a string or number")
 
-    res = save_feedback(video_id, bool(liked))
+    res = save_feedback(str(video_id), bool(liked))
     return res
+
+@app.get("/feedback/stats")
+def feedback_stats(video_id: Optional[str] = None):
+    """Like/dislike totals, overall and per video (or for one `video_id`)."""
+    return feedback_store.stats(video_id)
@@ -1,16 +1,53 @@
+import os
 from abc import ABC, abstractmethod
 from typing import Optional, Dict
 
+# Bounds for the providers' own per-job caches; unfinished jobs are never evicted
+PROVIDER_CACHE_SIZE = int(os.getenv("PROVIDER_CACHE_SIZE", "2048"))
+PROVIDER_CACHE_TTL = float(os.getenv("PROVIDER_CACHE_TTL", "3600"))  # seconds
+
 class VideoJob:
+    __slots__ = ("job_id", "status", "video_url", "error", "retry_after", "transient")
+
     def __init__(self, job_id: str, status: str = "queued",
-                 video_url: Optional[str] = None, error: Optional[str] = None):
+                 video_url: Optional[str] = None, error: Optional[str] = None,
+                 retry_after: Optional[float] = None, transient: bool = False):
         self.job_id = job_id
         self.status = status
         self.video_url = video_url
         self.error = error
+        self.retry_after = retry_after  # set when the provider throttled (HTTP 429) and nothing was submitted
+        self.transient = transient  # set when the status could not be read (network error, 5xx); the job may still be running
+
+def parse_retry_after(value: Optional[str], default: float = 10.0) -> float:
+    """Seconds from a Retry-After header (delta-seconds form), or `default`."""
+    try:
+        return max(float(value), 0.0) if value is not None else default
+    except ValueError:
+        return default
 
 class BaseProvider(ABC):
     @abstractmethod
     def submit(self, prompt: str, options: Dict) -> VideoJob: ...
     @abstractmethod
     def fetch(self, job_id: str) -> VideoJob: ...
+
+    def generation_params(self, options: Dict) -> Dict[str, str]:
+        """Output parameters that drive generation time (duration, aspect_ratio), for ETA estimates."""
+        return {}
+
+    def parse_webhook(self, payload: Dict) -> Optional[VideoJob]:
+        """Translate a completion callback body into a VideoJob (None if webhooks are unsupported)."""
+        return None
+
+class AsyncBaseProvider(ABC):
+    """
+    Non-blocking twin of BaseProvider for use on the event loop.
+    Implementations keep one pooled client per provider and release it in `aclose`.
+    """
+    @abstractmethod
+    async def asubmit(self, prompt: str, options: Dict) -> VideoJob: ...
+    @abstractmethod
+    async def afetch(self, job_id: str) -> VideoJob: ...
+
+    async def aclose(self): ...
@@ -1,21 +1,107 @@
-import time, threading
-from .base import BaseProvider, VideoJob
+import os, math, time, random, threading, asyncio, uuid, logging
+from typing import Callable, Dict, Optional, Union
+import httpx
+from app.services.ttl_cache import TTLCache
+from .base import AsyncBaseProvider, BaseProvider, VideoJob, PROVIDER_CACHE_SIZE, PROVIDER_CACHE_TTL
 
-class MockProvider(BaseProvider):
-    def __init__(self):
-        self._jobs = {}
+# Generation time: seconds, or "uniform:LOW,HIGH" / "lognormal:MEDIAN,SIGMA" / "exp:MEAN"
+MOCK_LATENCY = os.getenv("MOCK_LATENCY", "2.0")
+MOCK_SEED = os.getenv("MOCK_SEED", "")  # fixed seed for reproducible latency draws
 
-    def submit(self, prompt: str, options: dict) -> VideoJob:
-        job_id = str(int(time.time() * 1000))
+
+def latency_sampler(spec: Union[float, str], rng: Optional[random.Random] = None) -> Callable[[], float]:
+    """Build a sampler for a MOCK_LATENCY-style spec."""
+    rng = rng or random.Random()
+    if isinstance(spec, (int, float)):
+        return lambda: float(spec)
+    kind, _, args = str(spec).partition(":")
+    params = [float(a) for a in args.split(",") if a]
+    if not args:
+        value = float(kind)
+        return lambda: value
+    if kind == "uniform":
+        return lambda: rng.uniform(params[0], params[1])
+    if kind == "lognormal":
+        mu, sigma = math.log(params[0]), params[1]
+        return lambda: rng.lognormvariate(mu, sigma)
+    if kind == "exp":
+        return lambda: rng.expovariate(1 / params[0])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+class MockProvider(BaseProvider, AsyncBaseProvider):
+    """
+    In-process stand-in provider: every job succeeds after a latency drawn from
+    `latency` (see `latency_sampler`; MOCK_LATENCY by default).
+    When the submit options carry a `webhook` URL it is called back like a real
+    provider would, with {"id": ..., "status": "succeeded"}.
+    `calls` counts submit and fetch calls, as a real provider would bill them.
+    """
+
+    def __init__(self, latency: Union[float, str, None] = None):
+        rng = random.Random(int(MOCK_SEED)) if MOCK_SEED else None
+        self._latency = latency_sampler(MOCK_LATENCY if latency is None else latency, rng)
+        self.calls = {"submit": 0, "fetch": 0}
+        self._jobs = TTLCache(PROVIDER_CACHE_SIZE, PROVIDER_CACHE_TTL, pin=lambda job: job.status == "processing")
+        self._tasks = set()  # keep completion tasks referenced until they finish
+        self.log = logging.getLogger("provider.mock")
+
+    def _new_job(self) -> VideoJob:
+        self.calls["submit"] += 1
+        job_id = uuid.uuid4().hex[:16]  # unique even for submits within the same millisecond
         job = VideoJob(job_id, status="processing")
-        self._jobs[job_id] = job
+        self._jobs.set(job_id, job)
+        return job
+
+    def submit(self, prompt: str, options: dict) -> VideoJob:
+        job = self._new_job()
+        webhook = (options or {}).get("webhook")
+        latency = self._latency()
 
         def _worker():
-            time.sleep(2)  # simulate generation latency
+            time.sleep(latency)  # simulate generation latency
             job.status = "succeeded"  # video served via /video/{job_id}
+            if webhook:
+                try:
+                    httpx.post(webhook, json=self._callback(job), timeout=10)
+                except httpx.HTTPError:
+                    self.log.exception("Webhook delivery failed")
 
         threading.Thread(target=_worker, daemon=True).start()
         return job
 
+    async def asubmit(self, prompt: str, options: dict) -> VideoJob:
+        job = self._new_job()
+        webhook = (options or {}).get("webhook")
+        latency = self._latency()
+
+        async def _finish():
+            await asyncio.sleep(latency)  # simulate generation latency without a thread
+            job.status = "succeeded"
+            if webhook:
+                try:
+                    async with httpx.AsyncClient(timeout=10) as client:
+                        await client.post(webhook, json=self._callback(job))
+                except httpx.HTTPError:
+                    self.log.exception("Webhook delivery failed")
+
+        task = asyncio.get_running_loop().create_task(_finish())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
     def fetch(self, job_id: str) -> VideoJob:
+        self.calls["fetch"] += 1
         return self._jobs.get(job_id) or VideoJob(job_id, status="not_found", error="Unknown job")
+
+    async def afetch(self, job_id: str) -> VideoJob:
+        return self.fetch(job_id)
+
+    def parse_webhook(self, payload: Dict) -> Optional[VideoJob]:
+        if not payload.get("id"):
+            return None
+        return VideoJob(payload["id"], status=payload.get("status", "processing"), error=payload.get("error"))
+
+    @staticmethod
+    def _callback(job: VideoJob) -> Dict:
+        return {"id": job.job_id, "status": job.status}
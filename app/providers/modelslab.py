@@ -1,35 +1,76 @@
+import os
 import time
 import logging
-import requests
-from typing import Dict, Optional
-from .base import BaseProvider, VideoJob
+import httpx
+from typing import TYPE_CHECKING, Dict, Optional
+from app.services.ttl_cache import TTLCache
+from .base import AsyncBaseProvider, BaseProvider, VideoJob, parse_retry_after, PROVIDER_CACHE_SIZE, PROVIDER_CACHE_TTL
 
-class ModelsLabProvider(BaseProvider):
+if TYPE_CHECKING:
+    import requests
+
+class ModelsLabProvider(BaseProvider, AsyncBaseProvider):
     """
     Adapter that exposes a BaseProvider interface over the Stable Diffusion
-    (ModelsLab) API directly using `requests`.
+    (ModelsLab) API directly using `requests` (or `httpx` for the async path).
 
     For the demo, we still always return 'processing' first and let the frontend
     show the static placeholder.mp4. Real API responses are cached internally.
+    Both HTTP clients are created on first use and keep their connections alive.
     """
 
     def __init__(self, api_key: Optional[str] = None):
         self.api_key = api_key or "DEMO_KEY"  # replace with real key if available
-        self.api_url = "https://api.modelslab.com/v1/video"  # example endpoint
-        self._jobs: Dict[str, Dict] = {}  # job_id -> {"fetch_url":..., "output_url":..., "status":...}
+        # example endpoint; point MODELSLAB_API_URL at test_scripts/provider_stub.py to test offline
+        self.api_url = os.getenv("MODELSLAB_API_URL", "https://api.modelslab.com/v1/video").rstrip("/")
+        # job_id -> {"fetch_url":..., "output_url":..., "status":...}; unfinished jobs are never evicted
+        self._jobs: TTLCache[Dict] = TTLCache(PROVIDER_CACHE_SIZE, PROVIDER_CACHE_TTL,
+                                              pin=lambda data: data.get("status") not in ("succeeded", "failed"))
         self.log = logging.getLogger("provider.modelslab")
 
-    def submit(self, prompt: str, options: Dict) -> VideoJob:
-        overrides = self._style_overrides(options.get("style")) if options else {}
+        self._headers = {"Authorization": f"Bearer {self.api_key}"}
+        self._session: Optional["requests.Session"] = None
+        self._aclient: Optional[httpx.AsyncClient] = None
+
+    @property
+    def session(self) -> "requests.Session":
+        # Only the sync path needs requests; import it when that path is first used
+        if self._session is None:
+            import requests
+            self._session = requests.Session()
+            self._session.headers.update(self._headers)
+        return self._session
+
+    @property
+    def aclient(self) -> httpx.AsyncClient:
+        # Built lazily so it binds to the running event loop
+        if self._aclient is None:
+            self._aclient = httpx.AsyncClient(
+                headers=self._headers,
+                timeout=30.0,
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+            )
+        return self._aclient
 
+    def submit(self, prompt: str, options: Dict) -> VideoJob:
         try:
-            payload = {
-                "prompt": prompt,
-                **overrides
-            }
-            headers = {"Authorization": f"Bearer {self.api_key}"}
+            resp = self.session.post(self.api_url + "/text2video", json=self._payload(prompt, options))
+            if resp.status_code == 429:
+                return self._throttled(resp.headers.get("Retry-After"))
+            resp.raise_for_status()
+            resp_json = resp.json()
+
+        except Exception as e:
+            self.log.exception("Error submitting job to ModelsLab")
+            return VideoJob(job_id="n/a", status="failed", error=str(e))
+
+        return self._submitted(resp_json)
 
-            resp = requests.post(self.api_url + "/text2video", json=payload, headers=headers)
+    async def asubmit(self, prompt: str, options: Dict) -> VideoJob:
+        try:
+            resp = await self.aclient.post(self.api_url + "/text2video", json=self._payload(prompt, options))
+            if resp.status_code == 429:
+                return self._throttled(resp.headers.get("Retry-After"))
             resp.raise_for_status()
             resp_json = resp.json()
 
@@ -37,56 +78,131 @@ class ModelsLabProvider(BaseProvider):
             self.log.exception("Error submitting job to ModelsLab")
             return VideoJob(job_id="n/a", status="failed", error=str(e))
 
+        return self._submitted(resp_json)
+
+    def fetch(self, job_id: str) -> VideoJob:
+        data, done = self._lookup(job_id)
+        if done:
+            return done
+
+        # Poll provider
+        try:
+            resp = self.session.get(data["fetch_url"])
+            resp.raise_for_status()
+            resp_json = resp.json()
+        except Exception as e:
+            return self._fetch_failed(job_id, e)
+
+        return self._polled(job_id, data, resp_json)
+
+    async def afetch(self, job_id: str) -> VideoJob:
+        data, done = self._lookup(job_id)
+        if done:
+            return done
+
+        try:
+            resp = await self.aclient.get(data["fetch_url"])
+            resp.raise_for_status()
+            resp_json = resp.json()
+        except Exception as e:
+            return self._fetch_failed(job_id, e)
+
+        return self._polled(job_id, data, resp_json)
+
+    async def aclose(self):
+        if self._aclient is not None:
+            await self._aclient.aclose()
+            self._aclient = None
+
+    def _payload(self, prompt: str, options: Dict) -> Dict:
+        overrides = self._style_overrides(options.get("style")) if options else {}
+        payload = {
+            "prompt": prompt,
+            **overrides
+        }
+        if options and options.get("webhook"):
+            payload["webhook"] = options["webhook"]  # ModelsLab POSTs the result here when done
+        return payload
+
+    def generation_params(self, options: Dict) -> Dict[str, str]:
+        overrides = self._payload("", options)
+        if "num_frames" not in overrides:
+            return {}
+        return {"duration": f"{overrides['num_frames'] / overrides['fps']:g}"}
+
+    def _throttled(self, retry_after: Optional[str]) -> VideoJob:
+        self.log.warning("ModelsLab throttled submission (429)")
+        return VideoJob(job_id="n/a", status="queued", retry_after=parse_retry_after(retry_after))
+
+    def _submitted(self, resp_json: Dict) -> VideoJob:
         if resp_json.get("status") == "error":
             return VideoJob(job_id="n/a", status="failed", error=resp_json.get("message"))
 
         # Ensure job_id
         job_id = resp_json.get("id") or str(int(time.time() * 1000))
-        self._jobs[job_id] = {
+        self._jobs.set(job_id, {
             "fetch_url": resp_json.get("fetch_url"),
             "output_url": resp_json.get("output_url"),
             "status": resp_json.get("status"),
-        }
+        })
 
         return VideoJob(job_id=job_id, status="processing")
 
-    def fetch(self, job_id: str) -> VideoJob:
+    def _lookup(self, job_id: str):
+        """
+        Return (job data, None) when the provider must be polled,
+        or (job data, VideoJob) when the answer is already known locally.
+        """
         data = self._jobs.get(job_id)
         if not data:
-            return VideoJob(job_id, status="not_found", error="Unknown job")
+            # Job submitted by another process (or before a restart): poll it by id
+            data = {"fetch_url": f"{self.api_url}/fetch/{job_id}", "output_url": None, "status": "processing"}
+            self._jobs.set(job_id, data)
 
         # Cached success
         if data.get("status") == "succeeded":
-            return VideoJob(job_id, status="succeeded", video_url=data.get("output_url"))
+            return data, VideoJob(job_id, status="succeeded", video_url=data.get("output_url"))
 
-        fetch_url = data.get("fetch_url")
-        if not fetch_url and data.get("output_url"):
-            data["status"] = "succeeded"
-            return VideoJob(job_id, status="succeeded", video_url=data.get("output_url"))
-
-        # Poll provider
-        if fetch_url:
-            try:
-                headers = {"Authorization": f"Bearer {self.api_key}"}
-                resp = requests.get(fetch_url, headers=headers)
-                resp.raise_for_status()
-                resp_json = resp.json()
-            except Exception as e:
-                self.log.exception("Error fetching job result")
-                return VideoJob(job_id, status="failed", error=str(e))
-
-            status = resp_json.get("status")
-            if status == "processing":
-                return VideoJob(job_id, status="processing")
-            elif status in ("success", "succeeded"):
-                out = resp_json.get("output_url")
-                data["output_url"] = out
+        if not data.get("fetch_url"):
+            if data.get("output_url"):
                 data["status"] = "succeeded"
-                return VideoJob(job_id, status="succeeded", video_url=out)
-            else:
-                return VideoJob(job_id, status="failed", error=resp_json.get("message") or "provider_error")
-
-        return VideoJob(job_id, status="processing")
+                return data, VideoJob(job_id, status="succeeded", video_url=data.get("output_url"))
+            return data, VideoJob(job_id, status="processing")
+
+        return data, None
+
+    def _fetch_failed(self, job_id: str, e: Exception) -> VideoJob:
+        # network errors and 5xx say nothing about the job itself; the poller retries with backoff
+        self.log.warning("Error fetching job result for %s: %r", job_id, e)
+        return VideoJob(job_id, status="processing", error=str(e), transient=True)
+
+    def _polled(self, job_id: str, data: Dict, resp_json: Dict) -> VideoJob:
+        status = resp_json.get("status")
+        if status == "processing":
+            return VideoJob(job_id, status="processing")
+        elif status in ("success", "succeeded"):
+            out = resp_json.get("output_url")
+            data["output_url"] = out
+            data["status"] = "succeeded"
+            return VideoJob(job_id, status="succeeded", video_url=out)
+        else:
+            data["status"] = "failed"
+            return VideoJob(job_id, status="failed", error=resp_json.get("message") or "provider_error")
+
+    def parse_webhook(self, payload: Dict) -> Optional[VideoJob]:
+        job_id = payload.get("id")
+        if job_id is None:
+            return None
+        job_id = str(job_id)
+        output = payload.get("output") or payload.get("output_url")
+        if isinstance(output, list):
+            output = output[0] if output else None
+        data = self._jobs.get(job_id)
+        if data is None:
+            data = {"fetch_url": None, "output_url": None, "status": "processing"}
+            self._jobs.set(job_id, data)
+        resp_json = {"status": payload.get("status"), "output_url": output, "message": payload.get("message")}
+        return self._polled(job_id, data, resp_json)
 
     def _style_overrides(self, style: Optional[str]) -> Dict:
         """Optional gentle tuning based on 'style' selection."""
@@ -1,15 +1,30 @@
 import os
+import re
 import logging
-from typing import Dict, Optional
-import replicate
-from replicate.exceptions import ModelError
-from dotenv import load_dotenv
-from .base import BaseProvider, VideoJob
+from typing import TYPE_CHECKING, Dict, Optional
+import app.config  # noqa: F401  (loads .env)
+from app.services.ttl_cache import TTLCache
+from .base import AsyncBaseProvider, BaseProvider, VideoJob, parse_retry_after, PROVIDER_CACHE_SIZE, PROVIDER_CACHE_TTL
 
-# Load environment variables
-load_dotenv()
+if TYPE_CHECKING:
+    import replicate
+    from replicate.exceptions import ReplicateError
 
-class ReplicateProvider(BaseProvider):
+_TERMINAL = ("succeeded", "failed", "canceled")
+
+# One client (and so one keep-alive connection pool) per API token
+_clients: Dict[Optional[str], "replicate.Client"] = {}
+
+
+def _client_for(api_token: Optional[str]) -> "replicate.Client":
+    client = _clients.get(api_token)
+    if client is None:
+        import replicate  # the SDK is slow to import; load it with the first client
+        client = _clients[api_token] = replicate.Client(api_token=api_token)
+    return client
+
+
+class ReplicateProvider(BaseProvider, AsyncBaseProvider):
     """
     Replicate provider for text-to-video generation.
     Uses Replicate's API to generate videos from text prompts.
@@ -20,49 +35,60 @@ class ReplicateProvider(BaseProvider):
         # Using a cost-effective text-to-video model - this can be configured via env
         # Default to verified working text-to-video model
         self.model = model or os.getenv("REPLICATE_MODEL", "pixverse/pixverse-v5")
-        self._predictions: Dict[str, Dict] = {}  # Cache predictions
+        # Cache predictions; unfinished ones are never evicted
+        self._predictions: TTLCache[Dict] = TTLCache(PROVIDER_CACHE_SIZE, PROVIDER_CACHE_TTL,
+                                                     pin=lambda cached: cached["status"] not in _TERMINAL)
         self.log = logging.getLogger("provider.replicate")
-        
+
         if not self.api_token:
             self.log.warning("No REPLICATE_API_TOKEN found. Provider may not work correctly.")
 
+    @property
+    def client(self) -> "replicate.Client":
+        return _client_for(self.api_token)
+
     def submit(self, prompt: str, options: Dict) -> VideoJob:
         """
         Submit a text-to-video generation request to Replicate.
         """
+        from replicate.exceptions import ModelError, ReplicateError
         try:
-            # Set up the API token
-            if self.api_token:
-                os.environ["REPLICATE_API_TOKEN"] = self.api_token
-
-            # Prepare input for the model (Pixverse parameters)
-            model_input = {
-                "prompt": prompt,
-                "aspect_ratio": "16:9",
-                "duration": 5
-            }
-            
-            # Apply style-based overrides if provided
-            if options and options.get("style"):
-                style_overrides = self._get_style_overrides(options["style"])
-                model_input.update(style_overrides)
-
             # Create prediction using async mode (non-blocking)
-            prediction = replicate.predictions.create(
+            prediction = self.client.predictions.create(
                 model=self.model,
-                input=model_input
+                input=self._build_input(prompt, options),
+                **self._webhook_args(options)
             )
+            return self._submitted(prediction)
 
-            # Cache the prediction for later fetching
-            self._predictions[prediction.id] = {
-                "prediction": prediction,
-                "status": prediction.status,
-                "output": None
-            }
+        except ReplicateError as e:
+            if e.status == 429:
+                return self._throttled(e)
+            self.log.error(f"Replicate API error: {e!r}")
+            return VideoJob(job_id="n/a", status="failed", error=str(e.detail or e.title or e))
+        except ModelError as e:
+            self.log.error(f"Replicate model error: {e}")
+            return VideoJob(job_id="n/a", status="failed", error=f"Model error: {str(e)}")
+        except Exception as e:
+            self.log.exception("Error submitting job to Replicate")
+            return VideoJob(job_id="n/a", status="failed", error=str(e))
 
-            self.log.info(f"Created Replicate prediction: {prediction.id}")
-            return VideoJob(job_id=prediction.id, status="processing")
+    async def asubmit(self, prompt: str, options: Dict) -> VideoJob:
+        """Event-loop friendly `submit` over the client's pooled async connection."""
+        from replicate.exceptions import ModelError, ReplicateError
+        try:
+            prediction = await self.client.predictions.async_create(
+                model=self.model,
+                input=self._build_input(prompt, options),
+                **self._webhook_args(options)
+            )
+            return self._submitted(prediction)
 
+        except ReplicateError as e:
+            if e.status == 429:
+                return self._throttled(e)
+            self.log.error(f"Replicate API error: {e!r}")
+            return VideoJob(job_id="n/a", status="failed", error=str(e.detail or e.title or e))
         except ModelError as e:
             self.log.error(f"Replicate model error: {e}")
             return VideoJob(job_id="n/a", status="failed", error=f"Model error: {str(e)}")
@@ -75,58 +101,152 @@ class ReplicateProvider(BaseProvider):
         Check the status of a Replicate prediction and return updated VideoJob.
         """
         try:
-            # Set up the API token
-            if self.api_token:
-                os.environ["REPLICATE_API_TOKEN"] = self.api_token
-
             cached = self._predictions.get(job_id)
             if not cached:
                 # Try to get prediction from Replicate directly
-                try:
-                    prediction = replicate.predictions.get(job_id)
-                    cached = {
-                        "prediction": prediction,
-                        "status": prediction.status,
-                        "output": prediction.output
-                    }
-                    self._predictions[job_id] = cached
-                except Exception:
-                    return VideoJob(job_id, status="not_found", error="Unknown job")
-
-            prediction = cached["prediction"]
-            
+                prediction = self.client.predictions.get(job_id)
+                cached = self._remember(prediction)
+
+            if cached["prediction"] is None:
+                return self._cached_job(job_id, cached)
+
             # Refresh prediction status
-            prediction.reload()
-            
-            # Map Replicate status to our status
-            status = self._map_status(prediction.status)
-            
-            # Update cache
-            cached["status"] = prediction.status
-            cached["output"] = prediction.output
-
-            if status == "succeeded" and prediction.output:
-                # Replicate returns the video URL directly
-                video_url = prediction.output
-                if isinstance(video_url, list) and len(video_url) > 0:
-                    video_url = video_url[0]
-                
-                # Convert FileOutput to URL if needed
-                if hasattr(video_url, 'url'):
-                    video_url = video_url.url
-                
-                return VideoJob(job_id=job_id, status="succeeded", video_url=str(video_url))
-            
-            elif status == "failed":
-                error_msg = getattr(prediction, 'error', 'Generation failed')
-                return VideoJob(job_id=job_id, status="failed", error=str(error_msg))
-            
-            else:
-                return VideoJob(job_id=job_id, status=status)
+            cached["prediction"].reload()
+            return self._to_job(job_id, cached)
+
+        except Exception as e:
+            return self._fetch_failed(job_id, e)
+
+    async def afetch(self, job_id: str) -> VideoJob:
+        """Event-loop friendly `fetch` over the client's pooled async connection."""
+        try:
+            cached = self._predictions.get(job_id)
+            if not cached:
+                prediction = await self.client.predictions.async_get(job_id)
+                cached = self._remember(prediction)
+
+            if cached["prediction"] is None:
+                return self._cached_job(job_id, cached)
+
+            await cached["prediction"].async_reload()
+            return self._to_job(job_id, cached)
 
         except Exception as e:
-            self.log.exception("Error fetching job result from Replicate")
-            return VideoJob(job_id, status="failed", error=str(e))
+            return self._fetch_failed(job_id, e)
+
+    async def aclose(self):
+        """Close this token's pooled connections; the next request opens a new client."""
+        client = _clients.pop(self.api_token, None)
+        if client is None:
+            return
+        # the SDK builds its httpx clients lazily and offers no close of its own
+        http = vars(client)
+        if http.get("_Client__async_client") is not None:
+            await http["_Client__async_client"].aclose()
+        if http.get("_Client__client") is not None:
+            http["_Client__client"].close()
+
+    def _fetch_failed(self, job_id: str, e: Exception) -> VideoJob:
+        """
+        A status read that raised. Only a 404 says anything about the prediction;
+        network errors and 5xx leave it running as far as we know.
+        """
+        from replicate.exceptions import ReplicateError
+        if isinstance(e, ReplicateError) and e.status == 404:
+            return VideoJob(job_id, status="not_found", error="Unknown job")
+        self.log.warning(f"Error fetching Replicate prediction {job_id}: {e!r}")
+        return VideoJob(job_id, status="processing", error=str(e), transient=True)
+
+    def _build_input(self, prompt: str, options: Dict) -> Dict:
+        # Prepare input for the model (Pixverse parameters)
+        model_input = {
+            "prompt": prompt,
+            "aspect_ratio": "16:9",
+            "duration": 5
+        }
+
+        # Apply style-based overrides if provided
+        if options and options.get("style"):
+            style_overrides = self._get_style_overrides(options["style"])
+            model_input.update(style_overrides)
+        return model_input
+
+    def _webhook_args(self, options: Dict) -> Dict:
+        # Replicate calls us back when the prediction completes; polling stays as a safety net
+        if options and options.get("webhook"):
+            return {"webhook": options["webhook"], "webhook_events_filter": ["completed"]}
+        return {}
+
+    def parse_webhook(self, payload: Dict) -> Optional[VideoJob]:
+        """The callback body is the prediction itself."""
+        if not payload.get("id"):
+            return None
+        return self._result(payload["id"], payload.get("status"), payload.get("output"), payload.get("error"))
+
+    def generation_params(self, options: Dict) -> Dict[str, str]:
+        model_input = self._build_input("", options)
+        return {"duration": str(model_input["duration"]), "aspect_ratio": model_input["aspect_ratio"]}
+
+    def _throttled(self, e: "ReplicateError") -> VideoJob:
+        # e.g. "Request was throttled. Expected available in 6 seconds."
+        m = re.search(r"(\d+(?:\.\d+)?)\s*second", e.detail or "")
+        retry_after = parse_retry_after(m.group(1) if m else None)
+        self.log.warning(f"Replicate throttled submission, retry in {retry_after}s")
+        return VideoJob(job_id="n/a", status="queued", retry_after=retry_after)
+
+    def _remember(self, prediction) -> Dict:
+        # Cache the prediction for later fetching
+        cached = {
+            "prediction": prediction,
+            "status": prediction.status,
+            "output": prediction.output,
+            "error": None,
+        }
+        self._predictions.set(prediction.id, cached)
+        return cached
+
+    def _submitted(self, prediction) -> VideoJob:
+        self._remember(prediction)
+        self.log.info(f"Created Replicate prediction: {prediction.id}")
+        return VideoJob(job_id=prediction.id, status="processing")
+
+    def _to_job(self, job_id: str, cached: Dict) -> VideoJob:
+        """Translate a freshly reloaded prediction into a VideoJob."""
+        prediction = cached["prediction"]
+
+        # Update cache
+        cached["status"] = prediction.status
+        cached["output"] = prediction.output
+        cached["error"] = getattr(prediction, 'error', None)
+        if prediction.status in _TERMINAL:
+            cached["prediction"] = None  # final: keep only the compact result, no more reloads
+
+        return self._cached_job(job_id, cached)
+
+    def _cached_job(self, job_id: str, cached: Dict) -> VideoJob:
+        return self._result(job_id, cached["status"], cached["output"], cached["error"])
+
+    def _result(self, job_id: str, replicate_status: str, output, error) -> VideoJob:
+        # Map Replicate status to our status
+        status = self._map_status(replicate_status)
+
+        if status == "succeeded" and output:
+            # Replicate returns the video URL directly
+            video_url = output
+            if isinstance(video_url, list) and len(video_url) > 0:
+                video_url = video_url[0]
+
+            # Convert FileOutput to URL if needed
+            if hasattr(video_url, 'url'):
+                video_url = video_url.url
+
+            return VideoJob(job_id=job_id, status="succeeded", video_url=str(video_url))
+
+        elif status == "failed":
+            return VideoJob(job_id=job_id, status="failed", error=str(error or 'Generation failed'))
+
+        else:
+            return VideoJob(job_id=job_id, status=status)
 
     def _map_status(self, replicate_status: str) -> str:
         """Map Replicate prediction status to our VideoJob status."""
@@ -142,7 +262,7 @@ class ReplicateProvider(BaseProvider):
     def _get_style_overrides(self, style: str) -> Dict:
         """Get style-specific parameter overrides."""
         style = style.lower()
-        
+
         if style == "cinematic":
             return {
                 "duration": 8,
@@ -158,5 +278,5 @@ class ReplicateProvider(BaseProvider):
                 "duration": 5,
                 "aspect_ratio": "1:1"
             }
-        
-        return {}
\ No newline at end of file
+
+        return {}
@@ -0,0 +1,168 @@
+import os, time, random, asyncio, threading, uuid, logging
+from typing import Dict, Optional, Tuple
+from app.services.ttl_cache import TTLCache
+from .base import AsyncBaseProvider, BaseProvider, VideoJob, PROVIDER_CACHE_SIZE, PROVIDER_CACHE_TTL
+from .mock import latency_sampler
+
+# Latency specs take the MOCK_LATENCY forms: seconds, "uniform:LO,HI", "lognormal:MEDIAN,SIGMA", "exp:MEAN"
+SIM_LATENCY = os.getenv("SIM_LATENCY", "lognormal:30,0.5")  # generation time
+SIM_SUBMIT_LATENCY = os.getenv("SIM_SUBMIT_LATENCY", "0")  # time the submit call itself takes
+SIM_SEED = int(os.getenv("SIM_SEED", "0"))
+SIM_FAIL_RATE = float(os.getenv("SIM_FAIL_RATE", "0"))  # share of jobs that end "failed"
+SIM_STUCK_RATE = float(os.getenv("SIM_STUCK_RATE", "0"))  # share of jobs that never leave "processing"
+# Fault windows as "PERIOD,LENGTH": for LENGTH seconds out of every PERIOD every request gets a 429 / 5xx
+SIM_THROTTLE = os.getenv("SIM_THROTTLE", "")
+SIM_ERRORS = os.getenv("SIM_ERRORS", "")
+SIM_URL_TTL = float(os.getenv("SIM_URL_TTL", "3600"))  # seconds an output URL stays valid
+
+
+def _window(spec: str) -> Optional[Tuple[float, float]]:
+    if not spec:
+        return None
+    period, length = (float(x) for x in spec.split(","))
+    return period, length
+
+
+class SimulatedUpstream:
+    """
+    Deterministic model of a video-generation API shared by `SimulatorProvider` and the
+    HTTP stand-in in test_scripts/provider_stub.py. With the same seed and submit order,
+    every job gets the same latency and fate (succeeded, failed or stuck); throttling and
+    5xx bursts follow fixed windows measured from construction.
+    """
+
+    def __init__(self, latency=None, submit_latency=None, seed: Optional[int] = None,
+                 fail_rate: Optional[float] = None, stuck_rate: Optional[float] = None,
+                 throttle: Optional[str] = None, errors: Optional[str] = None,
+                 url_ttl: Optional[float] = None):
+        self.rng = random.Random(SIM_SEED if seed is None else seed)
+        self._latency = latency_sampler(SIM_LATENCY if latency is None else latency, self.rng)
+        self._submit_latency = latency_sampler(SIM_SUBMIT_LATENCY if submit_latency is None else submit_latency,
+                                               self.rng)
+        self.fail_rate = SIM_FAIL_RATE if fail_rate is None else fail_rate
+        self.stuck_rate = SIM_STUCK_RATE if stuck_rate is None else stuck_rate
+        self.throttle = _window(SIM_THROTTLE if throttle is None else throttle)
+        self.errors = _window(SIM_ERRORS if errors is None else errors)
+        self.url_ttl = SIM_URL_TTL if url_ttl is None else url_ttl
+        self.started = time.monotonic()
+        self.jobs: TTLCache[Dict] = TTLCache(PROVIDER_CACHE_SIZE, PROVIDER_CACHE_TTL)
+        self.calls = {"submit": 0, "fetch": 0, "throttled": 0, "errors": 0}
+        self._lock = threading.Lock()  # the rng and counters are shared by threads and the loop
+
+    def _in(self, window: Optional[Tuple[float, float]]) -> Optional[float]:
+        """Seconds left in the current fault window, or None outside it."""
+        if window is None:
+            return None
+        period, length = window
+        phase = (time.monotonic() - self.started) % period
+        return length - phase if phase < length else None
+
+    def fault(self, throttle: bool = True) -> Optional[Tuple[int, Optional[float]]]:
+        """(429, retry_after) or (503, None) when this request should be rejected; polls pass throttle=False."""
+        with self._lock:
+            if self._in(self.errors) is not None:
+                self.calls["errors"] += 1
+                return 503, None
+            left = self._in(self.throttle) if throttle else None
+            if left is not None:
+                self.calls["throttled"] += 1
+                return 429, max(left, 0.1)
+        return None
+
+    def submit_delay(self) -> float:
+        with self._lock:
+            return max(self._submit_latency(), 0.0)
+
+    def create(self, payload: Optional[Dict] = None) -> Dict:
+        with self._lock:
+            self.calls["submit"] += 1
+            roll = self.rng.random()
+            latency = max(self._latency(), 0.0)
+            job_id = uuid.UUID(int=self.rng.getrandbits(128)).hex[:16]
+        if roll < self.stuck_rate:
+            outcome = "stuck"
+        elif roll < self.stuck_rate + self.fail_rate:
+            outcome = "failed"
+        else:
+            outcome = "succeeded"
+        job = {
+            "id": job_id,
+            "input": payload or {},
+            "created": time.time(),
+            "latency": latency,
+            "ready_at": time.monotonic() + latency,
+            "outcome": outcome,
+        }
+        self.jobs.set(job["id"], job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            self.calls["fetch"] += 1
+        return self.jobs.get(job_id)
+
+    def status(self, job: Dict) -> str:
+        if job["outcome"] == "stuck" or time.monotonic() < job["ready_at"]:
+            return "processing"
+        return job["outcome"]
+
+    def expires(self, job: Dict) -> int:
+        """Wall-clock expiry of the job's output URL."""
+        return int(job["created"] + job["latency"] + self.url_ttl) if self.url_ttl else 0
+
+
+class SimulatorProvider(BaseProvider, AsyncBaseProvider):
+    """
+    In-process provider backed by `SimulatedUpstream`: realistic latencies, failures,
+    stuck jobs, throttling (surfaced as queued + retry_after, like the real providers)
+    and 5xx bursts (submit failures, transient fetch errors), without any network. Output is served by
+    /video/{job_id} like the mock provider.
+    """
+
+    def __init__(self, upstream: Optional[SimulatedUpstream] = None):
+        self.upstream = upstream or SimulatedUpstream()
+        self.log = logging.getLogger("provider.simulator")
+
+    def _rejected(self) -> Optional[VideoJob]:
+        fault = self.upstream.fault()
+        if fault is None:
+            return None
+        code, retry_after = fault
+        if code == 429:
+            return VideoJob(job_id="n/a", status="queued", retry_after=retry_after)
+        return VideoJob(job_id="n/a", status="failed", error=f"Simulated upstream error ({code})")
+
+    def submit(self, prompt: str, options: Dict) -> VideoJob:
+        time.sleep(self.upstream.submit_delay())
+        rejected = self._rejected()
+        if rejected:
+            return rejected
+        job = self.upstream.create({"prompt": prompt, **(options or {})})
+        return VideoJob(job["id"], status="processing")
+
+    async def asubmit(self, prompt: str, options: Dict) -> VideoJob:
+        await asyncio.sleep(self.upstream.submit_delay())
+        rejected = self._rejected()
+        if rejected:
+            return rejected
+        job = self.upstream.create({"prompt": prompt, **(options or {})})
+        return VideoJob(job["id"], status="processing")
+
+    def fetch(self, job_id: str) -> VideoJob:
+        job = self.upstream.get(job_id)
+        if job is None:
+            return VideoJob(job_id, status="not_found", error="Unknown job")
+        fault = self.upstream.fault(throttle=False)
+        if fault is not None:
+            return VideoJob(job_id, status="processing", error=f"Simulated upstream error ({fault[0]})", transient=True)
+        status = self.upstream.status(job)
+        if status == "failed":
+            return VideoJob(job_id, status="failed", error="Simulated generation failure")
+        return VideoJob(job_id, status=status)
+
+    async def afetch(self, job_id: str) -> VideoJob:
+        return self.fetch(job_id)  # in-memory, never blocks
+
+    @property
+    def calls(self) -> Dict[str, int]:
+        return self.upstream.calls
@@ -0,0 +1,85 @@
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+# Seconds to completion assumed before any samples (for ETAs and webhook safety polls;
+# the poller itself backs off from POLL_MIN_INTERVAL until a key has samples)
+ETA_PRIOR = float(os.getenv("ETA_PRIOR", "60"))
+ETA_EWMA_ALPHA = float(os.getenv("ETA_EWMA_ALPHA", "0.2"))
+
+EtaKey = Tuple[str, str, str, str, str]  # (provider, model, style, duration, aspect_ratio)
+
+
+class _Estimate:
+    __slots__ = ("mean", "dev", "samples")
+
+    def __init__(self, seconds: float):
+        self.mean = seconds
+        self.dev = seconds / 4
+        self.samples = 1
+
+
+class CompletionEstimator:
+    """
+    Learns how long generations take, per (provider, model, style, duration, aspect_ratio).
+
+    Keeps an EWMA of the completion time and of its absolute deviation. A key with no
+    samples yet falls back to the same provider and model across all parameters, then
+    to ETA_PRIOR.
+
+    A job found finished on its first poll only gives an upper bound on its completion
+    time; `observe_upper` takes that into account instead of recording the bound.
+    """
+
+    def __init__(self, alpha: float = ETA_EWMA_ALPHA, prior: float = ETA_PRIOR):
+        self.alpha = alpha
+        self.prior = prior
+        self._lock = threading.Lock()
+        self._by_key: Dict[tuple, _Estimate] = {}
+
+    def observe(self, key: EtaKey, seconds: float):
+        with self._lock:
+            for k in (key, key[:2]):
+                est = self._by_key.get(k)
+                if est is None:
+                    self._by_key[k] = _Estimate(seconds)
+                    continue
+                est.dev = (1 - self.alpha) * est.dev + self.alpha * abs(seconds - est.mean)
+                est.mean = (1 - self.alpha) * est.mean + self.alpha * seconds
+                est.samples += 1
+
+    def observe_upper(self, key: EtaKey, seconds: float):
+        """
+        A job took at most `seconds`. Ignored when that is no faster than the estimate;
+        otherwise recorded as the middle of [seconds - 2 * dev, seconds], which pulls an
+        inflated estimate down (and widens it, so the next first poll comes earlier).
+        """
+        with self._lock:
+            est = self._lookup(key)
+            mean, dev = (est.mean, est.dev) if est else (None, 0.0)
+        if mean is not None and seconds >= mean:
+            return
+        self.observe(key, max(seconds - dev, seconds / 2))
+
+    def _lookup(self, key: EtaKey) -> Optional[_Estimate]:
+        return self._by_key.get(key) or self._by_key.get(key[:2])
+
+    def learned(self, key: EtaKey) -> bool:
+        """Whether any job for this key (or its provider and model) has completed yet."""
+        with self._lock:
+            return self._lookup(key) is not None
+
+    def estimate(self, key: EtaKey) -> Tuple[float, float]:
+        """(expected seconds to completion, typical deviation)."""
+        with self._lock:
+            est = self._lookup(key)
+            if est is None:
+                return self.prior, self.prior / 2
+            return est.mean, est.dev
+
+    def snapshot(self) -> Dict[str, dict]:
+        with self._lock:
+            return {
+                "/".join(k): {"mean_s": round(e.mean, 1), "dev_s": round(e.dev, 1), "samples": e.samples}
+                for k, e in self._by_key.items() if len(k) > 2
+            }
@@ -1,20 +1,159 @@
 import os
+import json
+import asyncio
+import logging
+import threading
 from datetime import datetime
+from typing import Dict, List, Optional
 
-FEEDBACK_FILE = os.path.join("app", "user_feedback.txt")
+FEEDBACK_FILE = os.getenv("FEEDBACK_FILE", os.path.join("app", "user_feedback.jsonl"))
+LEGACY_FEEDBACK_FILE = os.path.join("app", "user_feedback.txt")  # old "ts | video_id=.. | liked=.." lines
+FEEDBACK_FLUSH_INTERVAL = float(os.getenv("FEEDBACK_FLUSH_INTERVAL", "1.0"))  # seconds
+FEEDBACK_MAX_BYTES = int(os.getenv("FEEDBACK_MAX_BYTES", str(5 * 1024 * 1024)))
+FEEDBACK_BACKUPS = int(os.getenv("FEEDBACK_BACKUPS", "5"))
 
-def save_feedback(video_id: str, liked: bool):
+
+class FeedbackStore:
     """
-    Append a feedback entry to app/user_feedback.txt
-    Format: 2025-08-23 12:10 | video_id=abc123 | liked=True
+    Buffered JSON-lines feedback log.
+
+    `record` only appends to an in-memory buffer and bumps the per-video aggregate;
+    a background task writes the buffer out, fsyncs, and rotates the file to
+    `<path>.1 .. <path>.N` once it passes `max_bytes`.
+    Each line looks like {"ts": "2025-08-23T12:10:00", "video_id": "abc123", "liked": true}.
     """
-    ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    line = f"{ts} | video_id={video_id} | liked={liked}\n"
 
-    # Ensure directory exists
-    os.makedirs(os.path.dirname(FEEDBACK_FILE), exist_ok=True)
+    def __init__(self, path: str = FEEDBACK_FILE, flush_interval: float = FEEDBACK_FLUSH_INTERVAL,
+                 max_bytes: int = FEEDBACK_MAX_BYTES, backups: int = FEEDBACK_BACKUPS):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.log = logging.getLogger("feedback")
+
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()  # one flush at a time
+        self._buffer: List[str] = []
+        self._stats: Dict[str, List[int]] = {}  # video_id -> [likes, dislikes]
+        self._task: Optional[asyncio.Task] = None
+        self._loaded = False
+
+    # ---- aggregate ----
+
+    def _load(self):
+        """Seed the aggregate from the current log, its backups and the legacy text file."""
+        if self._loaded:
+            return
+        self._loaded = True
+        paths = [f"{self.path}.{i}" for i in range(self.backups, 0, -1)] + [self.path]
+        for path in paths:
+            if not os.path.exists(path):
+                continue
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        self._count(str(entry["video_id"]), bool(entry["liked"]))
+                    except (ValueError, KeyError):
+                        continue
+        if os.path.exists(LEGACY_FEEDBACK_FILE):
+            with open(LEGACY_FEEDBACK_FILE, encoding="utf-8") as f:
+                for line in f:
+                    parts = dict(p.strip().split("=", 1) for p in line.split("|")[1:] if "=" in p)
+                    if "video_id" in parts and "liked" in parts:
+                        self._count(parts["video_id"], parts["liked"] == "True")
+
+    def load(self):
+        with self._lock:
+            self._load()
+
+    def _count(self, video_id: str, liked: bool):
+        counts = self._stats.setdefault(video_id, [0, 0])
+        counts[0 if liked else 1] += 1
+
+    def stats(self, video_id: Optional[str] = None) -> dict:
+        with self._lock:
+            self._load()
+            if video_id is not None:
+                likes, dislikes = self._stats.get(video_id, [0, 0])
+                return {"video_id": video_id, "likes": likes, "dislikes": dislikes}
+            videos = {vid: {"likes": c[0], "dislikes": c[1]} for vid, c in self._stats.items()}
+        return {
+            "likes": sum(v["likes"] for v in videos.values()),
+            "dislikes": sum(v["dislikes"] for v in videos.values()),
+            "videos": videos,
+        }
+
+    # ---- writes ----
+
+    def record(self, video_id: str, liked: bool):
+        entry = {"ts": datetime.now().isoformat(timespec="seconds"), "video_id": video_id, "liked": liked}
+        with self._lock:
+            self._load()
+            self._buffer.append(json.dumps(entry) + "\n")
+            self._count(video_id, liked)
+        if self._task is None:
+            # no background flusher (e.g. used from a script): write through
+            self.flush()
 
-    with open(FEEDBACK_FILE, "a", encoding="utf-8") as f:
-        f.write(line)
+    def flush(self):
+        with self._write_lock:
+            with self._lock:
+                lines, self._buffer = self._buffer, []
+            if not lines:
+                return
+            data = "".join(lines).encode("utf-8")
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            if os.path.exists(self.path) and os.path.getsize(self.path) + len(data) > self.max_bytes:
+                self._rotate()
+            with open(self.path, "ab") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
 
+    def _rotate(self):
+        for i in range(self.backups - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    # ---- background flusher ----
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception:
+                self.log.exception("Error flushing feedback")
+
+    async def start(self):
+        """Seed the aggregate off the event loop, then start the flusher."""
+        await asyncio.to_thread(self.load)
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await asyncio.to_thread(self.flush)
+
+
+feedback_store = FeedbackStore()
+
+
+def save_feedback(video_id: str, liked: bool):
+    """
+    Record a feedback entry; it reaches FEEDBACK_FILE on the next flush.
+    """
+    feedback_store.record(video_id, liked)
     return {"ok": True, "message": "Feedback saved"}
@@ -0,0 +1,76 @@
+import os
+import hmac
+import time
+import base64
+import hashlib
+from typing import NamedTuple, Optional
+from urllib.parse import quote, unquote
+
+# When set, /generate hands out signed job tokens that any worker can resolve without shared state
+JOB_TOKEN_SECRET = os.getenv("JOB_TOKEN_SECRET", "")
+JOB_TOKEN_TTL = float(os.getenv("JOB_TOKEN_TTL", "86400"))  # seconds a token stays valid
+JOB_TOKEN_WAIT = float(os.getenv("JOB_TOKEN_WAIT", "10"))  # seconds /generate waits for the upstream id
+
+PREFIX = "jt."
+_VERSION = "1"
+_SIG_BYTES = 12
+
+
+class JobToken(NamedTuple):
+    provider: str
+    upstream_id: str
+    prompt_hash: str
+    style: str
+    issued: int
+
+
+def enabled() -> bool:
+    return bool(JOB_TOKEN_SECRET)
+
+
+def is_token(value: str) -> bool:
+    return value.startswith(PREFIX)
+
+
+def _b64(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def _unb64(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def _sign(body: str) -> str:
+    return _b64(hmac.new(JOB_TOKEN_SECRET.encode(), body.encode(), hashlib.sha256).digest()[:_SIG_BYTES])
+
+
+def issue(provider: str, upstream_id: str, prompt_hash: str, style: str, issued: Optional[float] = None) -> str:
+    """
+    Compact, URL-safe token "jt.<body>.<sig>" naming a job by what the provider knows
+    about it, so /status and /video can answer on any worker. The body is readable
+    (base64url of "1|provider|upstream id|prompt hash|style|issued"), not secret; the
+    HMAC keeps it from being forged or altered. Fields are percent-encoded, so any
+    value (a user-chosen style included) round-trips.
+    """
+    issued = int(time.time() if issued is None else issued)
+    fields = (_VERSION, provider, upstream_id, prompt_hash, style, str(issued))
+    body = _b64("|".join(quote(f, safe="") for f in fields).encode())
+    return f"{PREFIX}{body}.{_sign(body)}"
+
+
+def decode(token: str) -> Optional[JobToken]:
+    """The token's fields, or None if it is malformed, forged or expired."""
+    if not enabled() or not is_token(token):
+        return None
+    body, _, sig = token[len(PREFIX):].partition(".")
+    try:
+        # bytes, since compare_digest raises TypeError on non-ASCII str
+        if not hmac.compare_digest(_sign(body).encode(), sig.encode()):
+            return None
+        version, provider, upstream_id, prompt_hash, style, issued = map(unquote, _unb64(body).decode().split("|"))
+        tok = JobToken(provider, upstream_id, prompt_hash, style, int(issued))
+    except ValueError:
+        return None
+    if version != _VERSION or time.time() - tok.issued > JOB_TOKEN_TTL:
+        return None
+    return tok
@@ -1,7 +1,17 @@
-from typing import Dict, Optional
+import os
+import sys
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
 from dataclasses import dataclass, field
+from app.services.ttl_cache import TTLCache
 
-@dataclass
+INFLIGHT_STATUSES = ("queued", "processing")
+# Finished records kept by the in-memory store; in-flight ones are never evicted
+JOB_CACHE_SIZE = int(os.getenv("JOB_CACHE_SIZE", "10000"))
+JOB_CACHE_TTL = float(os.getenv("JOB_CACHE_TTL", "86400"))  # seconds
+
+# One compact record per job: no per-instance __dict__ where the interpreter allows it (3.10+)
+@dataclass(**({"slots": True} if sys.version_info >= (3, 10) else {}))
 class JobRecord:
     job_id: str
     status: str
@@ -10,18 +20,93 @@ class JobRecord:
     prompt_hash: str
     cached: bool = False
     meta: Dict[str, str] = field(default_factory=dict)  # provider details (e.g., actual output URL)
+    version: int = 0  # bumped by every store.put; exposed as the /status ETag
+
+class BaseJobStore(ABC):
+    """
+    Storage contract for job records.
+    Records handed out may be copies, so callers `put` a record back after mutating it;
+    `put` bumps the record's version.
+    """
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[JobRecord]: ...
+    @abstractmethod
+    def get_by_hash(self, h: str) -> Optional[JobRecord]: ...
+    @abstractmethod
+    def put(self, rec: JobRecord): ...
+    @abstractmethod
+    def inflight(self) -> List[JobRecord]: ...
+    @abstractmethod
+    def put_group(self, group_id: str, job_ids: List[str]): ...
+    @abstractmethod
+    def get_group(self, group_id: str) -> Optional[List[str]]: ...
+
+    def succeeded_since(self, since: float, limit: int) -> List[JobRecord]:
+        """
+        Succeeded records written at or after `since` (epoch seconds), newest first,
+        for indexes rebuilt from a shared store. Stores private to one process return [].
+        """
+        return []
+
+    def stats(self) -> Dict[str, int]:
+        """Record counts for monitoring, e.g. {"records": .., "inflight": ..}."""
+        return {}
+
+    def flush(self):
+        """Persist buffered writes (no-op for stores that write through)."""
+
+    def close(self):
+        self.flush()
+
+def _inflight(rec: JobRecord) -> bool:
+    return rec.status in INFLIGHT_STATUSES
 
-class JobStore:
-    def __init__(self):
-        self._by_id: Dict[str, JobRecord] = {}
-        self._by_hash: Dict[str, JobRecord] = {}
+
+class JobStore(BaseJobStore):
+    """
+    In-memory job store. Finished records (and groups) are LRU/TTL evicted past
+    JOB_CACHE_SIZE / JOB_CACHE_TTL, so memory stays flat under sustained traffic;
+    in-flight records are pinned until they finish.
+    """
+
+    def __init__(self, maxsize: int = JOB_CACHE_SIZE, ttl: Optional[float] = JOB_CACHE_TTL):
+        self._by_id: TTLCache[JobRecord] = TTLCache(maxsize, ttl, pin=_inflight)
+        self._by_hash: TTLCache[JobRecord] = TTLCache(maxsize, ttl, pin=_inflight)
+        self._inflight: Dict[str, JobRecord] = {}
+        self._groups: TTLCache[List[str]] = TTLCache(maxsize, ttl)
 
     def get_by_hash(self, h: str) -> Optional[JobRecord]:
         return self._by_hash.get(h)
 
     def put(self, rec: JobRecord):
-        self._by_id[rec.job_id] = rec
-        self._by_hash[rec.prompt_hash] = rec
+        rec.version += 1
+        self._by_id.set(rec.job_id, rec)
+        self._by_hash.set(rec.prompt_hash, rec)
+        if _inflight(rec):
+            self._inflight[rec.job_id] = rec
+        else:
+            self._inflight.pop(rec.job_id, None)
 
     def get(self, job_id: str) -> Optional[JobRecord]:
         return self._by_id.get(job_id)
+
+    def inflight(self) -> List[JobRecord]:
+        """Records still waiting on the provider (polled in the background)."""
+        return list(self._inflight.values())
+
+    def stats(self) -> Dict[str, int]:
+        return {"records": len(self._by_id), "inflight": len(self._inflight), "groups": len(self._groups)}
+
+    def put_group(self, group_id: str, job_ids: List[str]):
+        self._groups.set(group_id, list(job_ids))
+
+    def get_group(self, group_id: str) -> Optional[List[str]]:
+        return self._groups.get(group_id)
+
+def build_job_store() -> BaseJobStore:
+    """Factory to select the job store based on env (JOB_STORE=memory|sqlite)."""
+    kind = os.getenv("JOB_STORE", "memory").lower()
+    if kind == "sqlite":
+        from app.services.sqlite_jobs import SQLiteJobStore
+        return SQLiteJobStore(os.getenv("JOB_DB_PATH", "jobs.db"))
+    return JobStore()
@@ -0,0 +1,202 @@
+"""
+Minimal in-process metrics registry rendered in the Prometheus text format.
+
+Updates are meant for the hot path: a labelled child is created once (under a lock)
+and cached, after which `inc`/`observe` only touch preallocated slots. Gauges that
+describe state (queue depth, store sizes) are computed by callbacks at scrape time
+instead of being kept up to date on every change.
+"""
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+# Seconds; spans fast API calls up to long generations
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUEUE_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+JOB_BUCKETS = (1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 45.0, 60.0, 90.0, 120.0, 180.0, 300.0, 600.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _num(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = self._children[values] = self._new_child()
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        head = f"# HELP {self.name} {self.help}\n# TYPE {self.name} {self.kind}\n"
+        return head + "".join(line + "\n" for line in self._samples())
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def _samples(self):
+        for values, child in list(self._children.items()):
+            yield f"{self.name}{_labels(self.labelnames, values)} {_num(child.value)}"
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last slot is +Inf
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def _samples(self):
+        for values, child in list(self._children.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), list(child.counts)):
+                cumulative += count
+                le = f'le="{_num(bound)}"'
+                yield f"{self.name}_bucket{_labels(self.labelnames, values, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, values)} {_num(child.sum)}"
+            yield f"{self.name}_count{_labels(self.labelnames, values)} {cumulative}"
+
+
+class CallbackMetric(_Metric):
+    """
+    Gauge (or counter) read at scrape time: `fn()` returns either a number or
+    a list of (label values, number) pairs.
+    """
+
+    def __init__(self, name: str, help: str, fn: Callable, labelnames: Sequence[str] = (), kind: str = "gauge"):
+        super().__init__(name, help, labelnames)
+        self.fn = fn
+        self.kind = kind
+
+    def _samples(self):
+        result = self.fn()
+        if isinstance(result, (int, float)):
+            result = [((), result)]
+        for values, value in result:
+            yield f"{self.name}{_labels(self.labelnames, values)} {_num(value)}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def callback(self, name: str, help: str, fn: Callable, labelnames: Sequence[str] = (),
+                 kind: str = "gauge") -> CallbackMetric:
+        """Register (or replace) a metric computed at scrape time."""
+        metric = CallbackMetric(name, help, fn, labelnames, kind)
+        with self._lock:
+            self._metrics[name] = metric
+        return metric
+
+    def render(self) -> str:
+        out: List[str] = []
+        for metric in list(self._metrics.values()):
+            try:
+                out.append(metric.render())
+            except Exception:
+                continue  # a failing callback must not break the whole scrape
+        return "".join(out)
+
+
+registry = Registry()
+
+# ---- metrics shared across modules ----
+
+PROVIDER_SUBMIT_SECONDS = registry.histogram(
+    "peppo_provider_submit_seconds", "Provider submit call latency", ("provider",))
+PROVIDER_FETCH_SECONDS = registry.histogram(
+    "peppo_provider_fetch_seconds", "Provider status fetch latency", ("provider",))
+JOB_SECONDS = registry.histogram(
+    "peppo_job_seconds", "End-to-end job time from queued to succeeded", ("provider", "style"), JOB_BUCKETS)
+JOB_QUEUE_SECONDS = registry.histogram(
+    "peppo_job_queue_seconds", "Time a job waited in the submission queue", ("provider",), QUEUE_BUCKETS)
+JOBS_FINISHED = registry.counter(
+    "peppo_jobs_finished_total", "Jobs that reached a terminal status", ("provider", "status"))
+SUBMIT_FAILURES = registry.counter(
+    "peppo_provider_submit_failures_total", "Submissions a provider rejected or errored on", ("provider",))
+SUBMIT_THROTTLED = registry.counter(
+    "peppo_provider_throttled_total", "Submissions a provider throttled (429)", ("provider",))
+PROMPT_CACHE = registry.counter(
+    "peppo_prompt_cache_lookups_total", "Prompt-hash lookups before submitting", ("result",))
+OPTIMIZER_CALLS = registry.counter(
+    "peppo_optimizer_calls_total", "Prompt optimizations by outcome", ("outcome",))
@@ -0,0 +1,109 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+
+_PRIME = (1 << 61) - 1
+
+
+def _shingles(text: str, k: int = 4) -> Set[str]:
+    """Character k-grams of a canonical prompt (short prompts still get a useful set)."""
+    padded = f" {text} "
+    if len(padded) <= k:
+        return {padded}
+    return {padded[i:i + k] for i in range(len(padded) - k + 1)}
+
+
+def _base_hash(shingle: str) -> int:
+    return int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=8).digest(), "big")
+
+
+class MinHashIndex:
+    """
+    MinHash signatures bucketed with LSH bands, for finding prompts whose
+    shingle sets have Jaccard similarity of at least `threshold`.
+
+    Entries are only compared within the same style. Past `maxsize` entries the
+    least recently added are dropped, like finished records in the job store.
+    """
+
+    def __init__(self, threshold: float = 0.85, num_perm: int = 64, bands: int = 16,
+                 maxsize: Optional[int] = None):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+
+        # Deterministic permutation parameters so signatures are stable across processes
+        self._perms: List[Tuple[int, int]] = []
+        for i in range(num_perm):
+            d = hashlib.blake2b(f"minhash-{i}".encode(), digest_size=16).digest()
+            a = int.from_bytes(d[:8], "big") % _PRIME or 1
+            b = int.from_bytes(d[8:], "big") % _PRIME
+            self._perms.append((a, b))
+
+        self._lock = threading.Lock()
+        self._signatures: "OrderedDict[str, Tuple[str, Tuple[int, ...]]]" = OrderedDict()  # key -> (style, sig)
+        self._buckets: Dict[Tuple[str, int, Tuple[int, ...]], Set[str]] = {}
+
+    def signature(self, text: str) -> Tuple[int, ...]:
+        hashes = [_base_hash(s) for s in _shingles(text)]
+        return tuple(
+            min((a * h + b) % _PRIME for h in hashes)
+            for a, b in self._perms
+        )
+
+    def _band_keys(self, style: str, sig: Tuple[int, ...]):
+        for band in range(self.bands):
+            yield (style, band, sig[band * self.rows:(band + 1) * self.rows])
+
+    def add(self, key: str, text: str, style: str):
+        if key in self._signatures:
+            return
+        sig = self.signature(text)
+        with self._lock:
+            if key in self._signatures:
+                return
+            self._signatures[key] = (style, sig)
+            for bk in self._band_keys(style, sig):
+                self._buckets.setdefault(bk, set()).add(key)
+            while self.maxsize is not None and len(self._signatures) > self.maxsize:
+                self._drop(next(iter(self._signatures)))
+
+    def remove(self, key: str):
+        with self._lock:
+            self._drop(key)
+
+    def _drop(self, key: str):
+        entry = self._signatures.pop(key, None)
+        if entry is None:
+            return
+        for bk in self._band_keys(*entry):
+            bucket = self._buckets.get(bk)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[bk]
+
+    def query(self, text: str, style: str, exclude: Optional[str] = None) -> List[Tuple[str, float]]:
+        """Keys with estimated similarity >= threshold, most similar first."""
+        sig = self.signature(text)
+        with self._lock:
+            candidates: Set[str] = set()
+            for bk in self._band_keys(style, sig):
+                candidates |= self._buckets.get(bk, set())
+            candidates.discard(exclude)
+            scored = []
+            for key in candidates:
+                other = self._signatures[key][1]
+                sim = sum(1 for x, y in zip(sig, other) if x == y) / self.num_perm
+                if sim >= self.threshold:
+                    scored.append((key, sim))
+        scored.sort(key=lambda kv: kv[1], reverse=True)
+        return scored
+
+    def __len__(self) -> int:
+        return len(self._signatures)
@@ -0,0 +1,50 @@
+import os
+import sys
+import time
+import threading
+from collections import Counter
+from typing import Optional
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")  # required for /admin/* endpoints; empty disables them
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "30"))
+
+_busy = threading.Lock()  # one profile at a time
+
+
+class ProfilerBusy(Exception):
+    pass
+
+
+def _stack(frame, thread_name: str) -> str:
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    names.append(thread_name)
+    return ";".join(reversed(names))
+
+
+def sample(seconds: float, interval: float = 0.005, thread_id: Optional[int] = None) -> str:
+    """
+    Sample every thread's Python stack (or just `thread_id`'s) every `interval` seconds
+    for `seconds`, and return collapsed stacks ("root;caller;callee count" per line)
+    ready for flamegraph.pl or speedscope. Blocks the calling thread; run it off the event loop.
+    """
+    if not _busy.acquire(blocking=False):
+        raise ProfilerBusy("A profile is already running")
+    try:
+        seconds = min(max(seconds, interval), PROFILE_MAX_SECONDS)
+        me = threading.get_ident()
+        counts: Counter = Counter()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me or (thread_id is not None and ident != thread_id):
+                    continue
+                counts[_stack(frame, names.get(ident, f"thread-{ident}"))] += 1
+            time.sleep(interval)
+        return "".join(f"{stack} {n}\n" for stack, n in counts.most_common())
+    finally:
+        _busy.release()
@@ -1,38 +1,193 @@
 import os
-from openai import OpenAI
-from dotenv import load_dotenv
+import time
+import asyncio
+import sqlite3
+import hashlib
+import threading
+from typing import TYPE_CHECKING, AsyncIterator, Iterable, Optional, Tuple
+import app.config  # noqa: F401  (loads .env)
+from app.services.ttl_cache import TTLCache
+from app.services.metrics import OPTIMIZER_CALLS
 
-# Load environment variables
-load_dotenv()
+if TYPE_CHECKING:
+    from openai import OpenAI
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+OPTIMIZER_MODEL = os.getenv("OPTIMIZER_MODEL", "gpt-4o-mini")
+OPTIMIZER_TEMPERATURE = float(os.getenv("OPTIMIZER_TEMPERATURE", "0.7"))
+OPTIMIZER_CACHE_SIZE = int(os.getenv("OPTIMIZER_CACHE_SIZE", "2048"))
+OPTIMIZER_CACHE_TTL = float(os.getenv("OPTIMIZER_CACHE_TTL", "86400"))  # seconds
+OPTIMIZER_CACHE_DB = os.getenv("OPTIMIZER_CACHE_DB", "")  # optional SQLite file shared across restarts
+OPTIMIZER_CACHE_DB_SIZE = int(os.getenv("OPTIMIZER_CACHE_DB_SIZE", "100000"))  # rows kept in that file
+OPTIMIZE_BATCH_CONCURRENCY = int(os.getenv("OPTIMIZE_BATCH_CONCURRENCY", "8"))
+
+_client: Optional["OpenAI"] = None
+_client_lock = threading.Lock()
+_cache: TTLCache[str] = TTLCache(OPTIMIZER_CACHE_SIZE, OPTIMIZER_CACHE_TTL)
+_disk: Optional["_DiskCache"] = None
+_disk_hits = 0
+
+_CALLS_CACHED = OPTIMIZER_CALLS.labels("cache_hit")
+_CALLS_API = OPTIMIZER_CALLS.labels("api")
+_CALLS_MOCK = OPTIMIZER_CALLS.labels("fallback_no_key")
+_CALLS_FAILED = OPTIMIZER_CALLS.labels("fallback_error")
+
+
+class _DiskCache:
+    """
+    Second-level optimizer cache in a SQLite file, honouring the same TTL.
+    Expired rows are deleted, and the newest `maxsize` kept, at startup and every
+    `prune_every` writes.
+    """
+
+    def __init__(self, path: str, ttl: float, maxsize: int = OPTIMIZER_CACHE_DB_SIZE, prune_every: int = 256):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.prune_every = prune_every
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS optimized (key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_optimized_created_at ON optimized (created_at)")
+        self.prune()
+
+    def prune(self):
+        with self._lock:
+            self._db.execute("DELETE FROM optimized WHERE created_at <= ?", (time.time() - self.ttl,))
+            self._db.execute(
+                """DELETE FROM optimized WHERE created_at <= (
+                       SELECT created_at FROM optimized ORDER BY created_at DESC LIMIT 1 OFFSET ?)""",
+                (self.maxsize,),
+            )
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value FROM optimized WHERE key = ? AND created_at > ?", (key, time.time() - self.ttl)
+            ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: str):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO optimized (key, value, created_at) VALUES (?, ?, ?)", (key, value, time.time())
+            )
+            self._writes += 1
+            due = self._writes % self.prune_every == 0
+        if due:
+            self.prune()
+
+
+def _get_client() -> "OpenAI":
+    """One shared client, so every call reuses its connection pool."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from openai import OpenAI  # the SDK is slow to import; only pay for it on first real call
+                _client = OpenAI(api_key=OPENAI_API_KEY)
+    return _client
+
+
+def _get_disk() -> Optional[_DiskCache]:
+    global _disk
+    if _disk is None and OPTIMIZER_CACHE_DB:
+        _disk = _DiskCache(OPTIMIZER_CACHE_DB, OPTIMIZER_CACHE_TTL)
+    return _disk
+
+
+def _cache_key(user_prompt: str, style: str, model: str, temperature: float) -> Tuple[str, str, str, float]:
+    return (user_prompt, style, model, temperature)
+
+
+def _disk_key(key: Tuple[str, str, str, float]) -> str:
+    return hashlib.sha256("\x1f".join(map(str, key)).encode()).hexdigest()
+
+
+def cache_stats() -> dict:
+    """Hit/miss counters for sizing the optimizer cache."""
+    stats = _cache.stats()
+    stats["disk_hits"] = _disk_hits
+    stats["ttl"] = _cache.ttl
+    return stats
+
 
 def optimize_prompt(user_prompt: str, style: str) -> str:
     """
     Optimize a raw prompt with style using OpenAI API.
     Fallback to mock response if no API key available.
+    Successful optimizations are memoized per (prompt, style, model, temperature).
     """
+    global _disk_hits
+
     if not user_prompt:
         return "Prompt cannot be empty."
 
     if not OPENAI_API_KEY:
         # Fallback mock output
+        _CALLS_MOCK.inc()
         return f"[Optimized Mock] A polished {style} style prompt based on: {user_prompt}"
 
-    try:
-        
-        client = OpenAI(api_key=OPENAI_API_KEY)
+    key = _cache_key(user_prompt, style, OPTIMIZER_MODEL, OPTIMIZER_TEMPERATURE)
+    cached = _cache.get(key)
+    if cached is not None:
+        _CALLS_CACHED.inc()
+        return cached
 
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
+    disk = _get_disk()
+    if disk:
+        cached = disk.get(_disk_key(key))
+        if cached is not None:
+            _disk_hits += 1
+            _CALLS_CACHED.inc()
+            _cache.set(key, cached)
+            return cached
+
+    try:
+        response = _get_client().chat.completions.create(
+            model=OPTIMIZER_MODEL,
             messages=[
                 {"role": "system", "content": "You are a Prompt Engineering expert who rewrites prompts for AI video generation."},
                 {"role": "user", "content": f"Prompt: {user_prompt}\nStyle: {style}\n\nPlease optimize this prompt for best video generation results."}
             ],
-            temperature=0.7,
+            temperature=OPTIMIZER_TEMPERATURE,
             max_tokens=100
         )
-        return response.choices[0].message.content.strip()
+        optimized = response.choices[0].message.content.strip()
 
     except Exception as e:
+        # Fallbacks are not cached so the next click retries the API
+        _CALLS_FAILED.inc()
         return f"[Fallback due to error] Optimized {style} style prompt: {user_prompt}"
+
+    _CALLS_API.inc()
+    _cache.set(key, optimized)
+    if disk:
+        disk.set(_disk_key(key), optimized)
+    return optimized
+
+
+async def optimize_prompts(
+    pairs: Iterable[Tuple[str, str]],
+    concurrency: int = OPTIMIZE_BATCH_CONCURRENCY,
+) -> AsyncIterator[Tuple[Tuple[str, str], str]]:
+    """
+    Optimize unique (prompt, style) pairs concurrently, at most `concurrency` at a time.
+    Yields ((prompt, style), optimized) in completion order.
+    """
+    sem = asyncio.Semaphore(concurrency)
+
+    async def _one(pair: Tuple[str, str]):
+        async with sem:
+            return pair, await asyncio.to_thread(optimize_prompt, *pair)
+
+    tasks = [asyncio.ensure_future(_one(pair)) for pair in dict.fromkeys(pairs)]
+    try:
+        for done in asyncio.as_completed(tasks):
+            yield await done
+    finally:
+        for t in tasks:
+            t.cancel()
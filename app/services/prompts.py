@@ -1,4 +1,5 @@
 import hashlib
+import unicodedata
 
 STYLE_PRESETS = {
     "cinematic": {
@@ -15,11 +16,35 @@ STYLE_PRESETS = {
     }
 }
 
+def style_label(style: str) -> str:
+    """A preset name, or "other": bounds per-style metrics and estimates against arbitrary input."""
+    return style if style in STYLE_PRESETS else "other"
+
 def compose_prompt(user_prompt: str, style: str = "cinematic") -> str:
     st = STYLE_PRESETS.get(style, {})
     g = st.get("guidance", "")
     n = st.get("negatives", "")
     return f"{user_prompt}. Style: {style}. Visual guidance: {g}. Negative prompts: {n}."
 
+def _edge(ch: str) -> bool:
+    return ch.isspace() or unicodedata.category(ch).startswith("P")
+
+def canonicalize_prompt(user_prompt: str) -> str:
+    """
+    Normalize a prompt for cache lookups, conservatively: compatibility forms (NFKC),
+    case, runs of whitespace and punctuation at either end are folded away. Accents,
+    emoji, symbols and inner punctuation are kept, since they change what is asked for.
+    "A cat  surfing." and "a cat surfing" canonicalize to the same text; "🐱 surfing"
+    and "🐶 surfing" do not. Punctuation-only prompts canonicalize to "".
+    """
+    text = " ".join(unicodedata.normalize("NFKC", user_prompt).casefold().split())
+    start, end = 0, len(text)
+    while start < end and _edge(text[start]):
+        start += 1
+    while end > start and _edge(text[end - 1]):
+        end -= 1
+    return text[start:end]
+
 def prompt_hash(user_prompt: str, style: str) -> str:
-    return hashlib.sha256(f"{user_prompt}|{style}".encode()).hexdigest()[:16]
+    canonical = canonicalize_prompt(user_prompt)
+    return hashlib.sha256(f"{canonical}\0{style.strip().lower()}".encode()).hexdigest()[:16]
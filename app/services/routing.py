@@ -0,0 +1,115 @@
+import os
+import time
+import threading
+from typing import Dict, Iterable, List, Optional
+
+ROUTING_EWMA_ALPHA = float(os.getenv("ROUTING_EWMA_ALPHA", "0.2"))  # weight of the newest sample
+ROUTING_ERROR_PENALTY = float(os.getenv("ROUTING_ERROR_PENALTY", "4.0"))  # score multiplier per unit error rate
+# An idle provider's error rate halves every this many seconds, so a failed-over provider gets retried
+ROUTING_ERROR_HALFLIFE = float(os.getenv("ROUTING_ERROR_HALFLIFE", "300"))
+# Priors for a provider we have no samples for yet (seconds)
+ROUTING_PRIOR_SUBMIT = float(os.getenv("ROUTING_PRIOR_SUBMIT", "1.0"))
+ROUTING_PRIOR_COMPLETION = float(os.getenv("ROUTING_PRIOR_COMPLETION", "60.0"))
+
+
+class ProviderHealth:
+    """EWMA submit latency, time-to-completion and error rate of one provider."""
+
+    def __init__(self, alpha: float = ROUTING_EWMA_ALPHA):
+        self.alpha = alpha
+        self.submit_latency = ROUTING_PRIOR_SUBMIT
+        self.completion_time = ROUTING_PRIOR_COMPLETION
+        self.error_rate = 0.0
+        self.error_at = time.monotonic()  # when error_rate was last updated
+        self.submits = 0
+        self.completions = 0
+        self.errors = 0
+
+    def _ewma(self, current: float, sample: float, first: bool) -> float:
+        return sample if first else (1 - self.alpha) * current + self.alpha * sample
+
+    def submitted(self, latency: float, ok: bool):
+        self.submit_latency = self._ewma(self.submit_latency, latency, self.submits == 0)
+        self.error_rate = self._ewma(self.current_error_rate(), 0.0 if ok else 1.0, self.submits == 0)
+        self.error_at = time.monotonic()
+        self.submits += 1
+        if not ok:
+            self.errors += 1
+
+    def completed(self, seconds: float):
+        self.completion_time = self._ewma(self.completion_time, seconds, self.completions == 0)
+        self.completions += 1
+
+    def failed(self):
+        """The provider accepted a job but then failed it."""
+        self.error_rate = self._ewma(self.current_error_rate(), 1.0, False)
+        self.error_at = time.monotonic()
+        self.errors += 1
+
+    def current_error_rate(self) -> float:
+        idle = time.monotonic() - self.error_at
+        return self.error_rate * 0.5 ** (idle / ROUTING_ERROR_HALFLIFE)
+
+    def score(self) -> float:
+        """Expected seconds to a finished video, inflated by the recent error rate. Lower is better."""
+        return (self.submit_latency + self.completion_time) * (1 + ROUTING_ERROR_PENALTY * self.current_error_rate())
+
+    def snapshot(self) -> dict:
+        return {
+            "submit_latency_ms": int(self.submit_latency * 1000),
+            "completion_s": round(self.completion_time, 1),
+            "error_rate": round(self.current_error_rate(), 3),
+            "submits": self.submits,
+            "completions": self.completions,
+            "errors": self.errors,
+            "score": round(self.score(), 2),
+        }
+
+
+class Router:
+    """
+    Ranks providers for the next submission by their health score.
+    Ties (e.g. before any samples) keep the configured order, so the first
+    provider is the default and the rest are failovers.
+    """
+
+    def __init__(self, names: Iterable[str]):
+        self.names: List[str] = list(names)
+        self._lock = threading.Lock()
+        self._health: Dict[str, ProviderHealth] = {name: ProviderHealth() for name in self.names}
+
+    def health(self, name: str) -> ProviderHealth:
+        with self._lock:
+            h = self._health.get(name)
+            if h is None:
+                h = self._health[name] = ProviderHealth()
+            return h
+
+    def ranked(self, exclude: Iterable[str] = ()) -> List[str]:
+        skip = set(exclude)
+        with self._lock:
+            scored = [(self._health[n].score(), i, n) for i, n in enumerate(self.names) if n not in skip]
+        return [n for _, _, n in sorted(scored)]
+
+    def pick(self, exclude: Iterable[str] = ()) -> Optional[str]:
+        ranked = self.ranked(exclude)
+        return ranked[0] if ranked else None
+
+    def record_submit(self, name: str, latency: float, ok: bool):
+        h = self.health(name)
+        with self._lock:
+            h.submitted(latency, ok)
+
+    def record_completion(self, name: str, seconds: float):
+        h = self.health(name)
+        with self._lock:
+            h.completed(seconds)
+
+    def record_failure(self, name: str):
+        h = self.health(name)
+        with self._lock:
+            h.failed()
+
+    def snapshot(self) -> Dict[str, dict]:
+        with self._lock:
+            return {n: self._health[n].snapshot() for n in self.names}
@@ -0,0 +1,222 @@
+import os
+import time
+import heapq
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional
+
+SCHEDULER_MAX_QUEUE = int(os.getenv("SCHEDULER_MAX_QUEUE", "200"))  # queued submissions per provider
+SUBMIT_RATE = float(os.getenv("SUBMIT_RATE", "2"))  # provider submissions per second
+SUBMIT_BURST = float(os.getenv("SUBMIT_BURST", "5"))
+PROVIDER_MAX_INFLIGHT = int(os.getenv("PROVIDER_MAX_INFLIGHT", "20"))  # jobs generating upstream at once
+
+PRIORITIES = {"interactive": 0, "batch": 1}
+
+
+def _env_limit(provider: str, name: str, default):
+    """Per-provider override, e.g. REPLICATE_SUBMIT_RATE, falling back to the global value."""
+    value = os.getenv(f"{provider.upper()}_{name}")
+    return type(default)(value) if value else default
+
+
+class QueueFull(Exception):
+    """Raised when a provider's queue is full; `retry_after` is a hint in seconds."""
+
+    def __init__(self, provider: str, retry_after: float):
+        super().__init__(f"{provider} queue is full")
+        self.provider = provider
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def delay(self) -> float:
+        """Seconds until a token is available (0 when one is available now)."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+    def pause(self, seconds: float):
+        """Upstream said slow down (429 / Retry-After): hold all submissions for `seconds`."""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+
+
+@dataclass(order=True)
+class _Item:
+    priority: int
+    seq: int
+    job_id: str = field(compare=False)
+    enqueued_at: float = field(compare=False)
+
+
+class _Lane:
+    """Queue, token bucket and in-flight cap for one provider."""
+
+    def __init__(self, name: str, max_queue: int):
+        self.name = name
+        self.max_queue = _env_limit(name, "MAX_QUEUE", max_queue)
+        self.bucket = TokenBucket(_env_limit(name, "SUBMIT_RATE", SUBMIT_RATE),
+                                  _env_limit(name, "SUBMIT_BURST", SUBMIT_BURST))
+        self.max_inflight = _env_limit(name, "MAX_INFLIGHT", PROVIDER_MAX_INFLIGHT)
+        self.heap: List[_Item] = []
+        self.inflight = 0
+        self.wait_ewma = 0.0  # seconds spent queued, smoothed
+        self.changed = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+
+# dispatch(job_id, provider, waited_seconds) -> None once the job holds an in-flight slot
+# (released later through Scheduler.release), or seconds to back off when throttled.
+Dispatch = Callable[[str, str, float], Awaitable[Optional[float]]]
+
+
+class Scheduler:
+    """
+    Admission control in front of the providers.
+
+    Each provider gets a bounded priority queue drained by one task that respects a
+    token-bucket submit rate, a cap on jobs in flight upstream, and any Retry-After
+    pause the provider asked for. A throttled submission goes back to the front of
+    its priority class.
+    """
+
+    def __init__(self, dispatch: Dispatch, max_queue: int = SCHEDULER_MAX_QUEUE):
+        self.dispatch = dispatch
+        self.max_queue = max_queue
+        self.log = logging.getLogger("scheduler")
+        self._lanes: Dict[str, _Lane] = {}
+        self._tracked: Dict[str, int] = {}  # job id -> lanes it is queued or being dispatched in
+        self._seq = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _lane(self, provider: str) -> _Lane:
+        lane = self._lanes.get(provider)
+        if lane is None:
+            lane = self._lanes[provider] = _Lane(provider, self.max_queue)
+            if self._loop:
+                lane.task = self._loop.create_task(self._run(lane))
+        return lane
+
+    # ---- admission ----
+
+    def room(self, provider: str) -> int:
+        lane = self._lane(provider)
+        return max(lane.max_queue - len(lane.heap), 0)
+
+    def retry_hint(self, provider: str) -> float:
+        """Rough seconds until the queue has drained enough to accept work again."""
+        lane = self._lane(provider)
+        paused = max(lane.bucket.paused_until - time.monotonic(), 0.0)
+        return max(1.0, paused + len(lane.heap) / max(lane.bucket.rate, 1e-6))
+
+    def admit(self, provider: str, n: int = 1):
+        """Raise QueueFull unless `n` more submissions fit in the provider's queue."""
+        if self.room(provider) < n:
+            raise QueueFull(provider, self.retry_hint(provider))
+
+    def enqueue(self, job_id: str, provider: str, priority: str = "interactive"):
+        self.admit(provider)
+        lane = self._lane(provider)
+        self._seq += 1
+        heapq.heappush(lane.heap, _Item(PRIORITIES.get(priority, 1), self._seq, job_id, time.monotonic()))
+        self._tracked[job_id] = self._tracked.get(job_id, 0) + 1
+        lane.changed.set()
+
+    def tracks(self, job_id: str) -> bool:
+        return job_id in self._tracked
+
+    def release(self, provider: str):
+        """A job holding an in-flight slot reached a terminal status. Safe from worker threads."""
+        if not self._loop:
+            return
+        self._loop.call_soon_threadsafe(self._release, provider)
+
+    def _release(self, provider: str):
+        lane = self._lane(provider)
+        lane.inflight = max(lane.inflight - 1, 0)
+        lane.changed.set()
+
+    def stats(self, provider: str) -> dict:
+        lane = self._lane(provider)
+        return {
+            "depth": len(lane.heap),
+            "max_depth": lane.max_queue,
+            "inflight": lane.inflight,
+            "max_inflight": lane.max_inflight,
+            "avg_wait_ms": int(lane.wait_ewma * 1000),
+            "paused_ms": int(max(lane.bucket.paused_until - time.monotonic(), 0.0) * 1000),
+        }
+
+    # ---- dispatch loop ----
+
+    async def _run(self, lane: _Lane):
+        while True:
+            if not lane.heap or lane.inflight >= lane.max_inflight:
+                lane.changed.clear()
+                await lane.changed.wait()
+                continue
+            delay = lane.bucket.delay()
+            if delay > 0:
+                lane.changed.clear()
+                try:
+                    await asyncio.wait_for(lane.changed.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            item = heapq.heappop(lane.heap)
+            lane.bucket.take()
+            lane.inflight += 1
+            waited = time.monotonic() - item.enqueued_at
+            lane.wait_ewma = waited if not lane.wait_ewma else 0.8 * lane.wait_ewma + 0.2 * waited
+            self._loop.create_task(self._dispatch(lane, item, waited))
+
+    async def _dispatch(self, lane: _Lane, item: _Item, waited: float):
+        try:
+            retry_after = await self.dispatch(item.job_id, lane.name, waited)
+        except Exception:
+            self.log.exception("Dispatch of job %s failed", item.job_id)
+            retry_after = None
+            lane.inflight = max(lane.inflight - 1, 0)
+        if retry_after is not None:
+            lane.inflight = max(lane.inflight - 1, 0)
+            lane.bucket.pause(retry_after)
+            heapq.heappush(lane.heap, item)
+        else:
+            # the dispatch may have moved the job to another provider's lane
+            left = self._tracked.pop(item.job_id, 1) - 1
+            if left > 0:
+                self._tracked[item.job_id] = left
+        lane.changed.set()
+
+    def start(self):
+        if self._loop:
+            return
+        self._loop = asyncio.get_running_loop()
+        for lane in self._lanes.values():
+            lane.task = self._loop.create_task(self._run(lane))
+
+    async def stop(self):
+        tasks = [lane.task for lane in self._lanes.values() if lane.task]
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for lane in self._lanes.values():
+            lane.task = None
+        self._loop = None
@@ -0,0 +1,199 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from typing import Dict, List, Optional
+from app.services.jobs import BaseJobStore, JobRecord, INFLIGHT_STATUSES
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id      TEXT PRIMARY KEY,
+    prompt_hash TEXT NOT NULL,
+    status      TEXT NOT NULL,
+    video_path  TEXT,
+    provider    TEXT NOT NULL,
+    cached      INTEGER NOT NULL DEFAULT 0,
+    meta        TEXT NOT NULL DEFAULT '{}',
+    version     INTEGER NOT NULL DEFAULT 0,
+    created_at  REAL NOT NULL,
+    updated_at  REAL NOT NULL,
+    lease_owner TEXT,
+    lease_until REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_prompt_hash ON jobs (prompt_hash, created_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status);
+CREATE INDEX IF NOT EXISTS idx_jobs_updated_at ON jobs (updated_at);
+CREATE TABLE IF NOT EXISTS job_groups (
+    group_id   TEXT PRIMARY KEY,
+    job_ids    TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+_COLUMNS = "job_id, status, video_path, provider, prompt_hash, cached, meta, version"
+
+_UPSERT = """
+INSERT INTO jobs (job_id, status, video_path, provider, prompt_hash, cached, meta, version, created_at, updated_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (job_id) DO UPDATE SET
+    status = excluded.status,
+    video_path = excluded.video_path,
+    provider = excluded.provider,
+    prompt_hash = excluded.prompt_hash,
+    cached = excluded.cached,
+    meta = excluded.meta,
+    version = excluded.version,
+    updated_at = excluded.updated_at
+"""
+
+
+def _row_to_record(row) -> JobRecord:
+    job_id, status, video_path, provider, h, cached, meta, version = row
+    return JobRecord(
+        job_id=job_id,
+        status=status,
+        video_path=video_path,
+        provider=provider,
+        prompt_hash=h,
+        cached=bool(cached),
+        meta=json.loads(meta or "{}"),
+        version=version,
+    )
+
+
+class SQLiteJobStore(BaseJobStore):
+    """
+    Job store backed by a SQLite database in WAL mode.
+
+    Writes are buffered and flushed in one transaction once `batch_size` records are
+    pending or a put finds `flush_interval` seconds have passed since the last flush;
+    writes that must survive a crash (a job's upstream id) are flushed by the caller.
+    Several worker processes can share the file: in-flight jobs are handed out under a
+    short lease so each one is polled by a single worker, and jobs left `processing` by
+    a crashed worker are picked up again once their lease expires.
+    """
+
+    def __init__(self, path: str = "jobs.db", batch_size: int = 64,
+                 flush_interval: float = 0.25, lease_ttl: float = 10.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.lease_ttl = lease_ttl
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+        self._lock = threading.RLock()
+        self._pending: Dict[str, JobRecord] = {}
+        self._last_flush = time.monotonic()
+
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("PRAGMA busy_timeout=30000")
+        self._db.executescript(_SCHEMA)
+        if "version" not in {row[1] for row in self._db.execute("PRAGMA table_info(jobs)")}:
+            # databases created before records were versioned
+            self._db.execute("ALTER TABLE jobs ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+
+    def get(self, job_id: str) -> Optional[JobRecord]:
+        with self._lock:
+            rec = self._pending.get(job_id)
+            if rec:
+                return rec
+            row = self._db.execute(
+                f"SELECT {_COLUMNS} FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        return _row_to_record(row) if row else None
+
+    def get_by_hash(self, h: str) -> Optional[JobRecord]:
+        with self._lock:
+            for rec in reversed(list(self._pending.values())):
+                if rec.prompt_hash == h:
+                    return rec
+            row = self._db.execute(
+                f"SELECT {_COLUMNS} FROM jobs WHERE prompt_hash = ? ORDER BY created_at DESC LIMIT 1", (h,)
+            ).fetchone()
+        return _row_to_record(row) if row else None
+
+    def put(self, rec: JobRecord):
+        with self._lock:
+            rec.version += 1
+            self._pending.pop(rec.job_id, None)  # keep insertion order = recency
+            self._pending[rec.job_id] = rec
+            if (len(self._pending) >= self.batch_size
+                    or time.monotonic() - self._last_flush >= self.flush_interval):
+                self.flush()
+
+    def flush(self):
+        with self._lock:
+            self._last_flush = time.monotonic()
+            if not self._pending:
+                return
+            now = time.time()
+            rows = [
+                (r.job_id, r.status, r.video_path, r.provider, r.prompt_hash,
+                 int(r.cached), json.dumps(r.meta), r.version, now, now)
+                for r in self._pending.values()
+            ]
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.executemany(_UPSERT, rows)
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+            self._pending.clear()
+
+    def inflight(self) -> List[JobRecord]:
+        """Claim (or renew) the lease on every in-flight job that no other worker holds."""
+        placeholders = ", ".join("?" for _ in INFLIGHT_STATUSES)
+        now = time.time()
+        with self._lock:
+            self.flush()
+            rows = self._db.execute(
+                f"""UPDATE jobs SET lease_owner = ?, lease_until = ?
+                    WHERE status IN ({placeholders})
+                      AND (lease_until IS NULL OR lease_until < ? OR lease_owner = ?)
+                    RETURNING {_COLUMNS}""",
+                (self.owner, now + self.lease_ttl, *INFLIGHT_STATUSES, now, self.owner),
+            ).fetchall()
+        return [_row_to_record(row) for row in rows]
+
+    def succeeded_since(self, since: float, limit: int) -> List[JobRecord]:
+        with self._lock:
+            self.flush()
+            rows = self._db.execute(
+                f"""SELECT {_COLUMNS} FROM jobs WHERE updated_at >= ? AND status = 'succeeded'
+                    ORDER BY updated_at DESC LIMIT ?""",
+                (since, limit),
+            ).fetchall()
+        return [_row_to_record(row) for row in rows]
+
+    def put_group(self, group_id: str, job_ids: List[str]):
+        with self._lock:
+            self.flush()  # members must be visible before the group is
+            self._db.execute(
+                "INSERT OR REPLACE INTO job_groups (group_id, job_ids, created_at) VALUES (?, ?, ?)",
+                (group_id, json.dumps(list(job_ids)), time.time()),
+            )
+
+    def get_group(self, group_id: str) -> Optional[List[str]]:
+        with self._lock:
+            row = self._db.execute("SELECT job_ids FROM job_groups WHERE group_id = ?", (group_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def stats(self) -> Dict[str, int]:
+        placeholders = ", ".join("?" for _ in INFLIGHT_STATUSES)
+        with self._lock:
+            records, inflight = self._db.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(status IN ({placeholders})), 0) FROM jobs", INFLIGHT_STATUSES
+            ).fetchone()
+            groups = self._db.execute("SELECT COUNT(*) FROM job_groups").fetchone()[0]
+            pending = len(self._pending)
+        return {"records": records, "inflight": inflight, "groups": groups, "pending_writes": pending}
+
+    def close(self):
+        with self._lock:
+            self.flush()
+            self._db.close()
@@ -0,0 +1,145 @@
+"""
+Landing-page assets prepared once at startup instead of on every request.
+
+Text assets in app/static are fingerprinted with a content hash (app.css -> app.<hash>.css)
+and kept in memory with gzip (and, when the optional `brotli` package is installed, br)
+variants. The index page is rendered once with their fingerprinted URLs. Responses pick
+an encoding from Accept-Encoding and answer If-None-Match with 304.
+"""
+import os
+import gzip
+import hashlib
+import mimetypes
+import threading
+from typing import Callable, Dict, Mapping
+from starlette.responses import Response
+
+try:
+    import brotli  # optional: br variants are only built when it is installed
+except ImportError:
+    brotli = None
+
+STATIC_DIR = "app/static"
+COMPRESSIBLE = (".css", ".js", ".svg", ".json", ".txt", ".html")
+MIN_COMPRESS_BYTES = 256  # smaller bodies are not worth an encoding
+IMMUTABLE = "public, max-age=31536000, immutable"  # fingerprinted URLs never change content
+REVALIDATE = "no-cache"  # the page itself: always revalidate, usually a 304
+
+
+def _accepted(accept_encoding: str) -> Dict[str, float]:
+    """Accept-Encoding -> {coding: q}."""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if coding:
+            accepted[coding.strip().lower()] = q
+    return accepted
+
+
+class Asset:
+    """One response body with its precompressed variants and strong ETags."""
+
+    __slots__ = ("media_type", "digest", "variants")
+
+    def __init__(self, body: bytes, media_type: str, compress: bool = True):
+        self.media_type = media_type
+        self.digest = hashlib.sha256(body).hexdigest()[:16]
+        self.variants: Dict[str, bytes] = {"identity": body}
+        if compress and len(body) >= MIN_COMPRESS_BYTES:
+            if brotli is not None:
+                self._keep("br", brotli.compress(body, quality=11), body)
+            self._keep("gzip", gzip.compress(body, compresslevel=9, mtime=0), body)
+
+    def _keep(self, coding: str, encoded: bytes, body: bytes):
+        if len(encoded) < len(body):
+            self.variants[coding] = encoded
+
+    def negotiate(self, accept_encoding: str) -> str:
+        accepted = _accepted(accept_encoding)
+        wildcard = accepted.get("*", 0.0)
+        for coding in ("br", "gzip"):  # smallest first
+            if coding in self.variants and accepted.get(coding, wildcard) > 0:
+                return coding
+        return "identity"
+
+    def response(self, request_headers: Mapping[str, str], cache_control: str) -> Response:
+        coding = self.negotiate(request_headers.get("accept-encoding", ""))
+        # each encoding is a different representation, so it gets its own strong ETag
+        etag = f'"{self.digest}"' if coding == "identity" else f'"{self.digest}-{coding}"'
+        headers = {"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+
+        inm = request_headers.get("if-none-match")
+        if inm and (inm.strip() == "*" or etag in (t.strip().removeprefix("W/") for t in inm.split(","))):
+            return Response(status_code=304, headers=headers)
+
+        if coding != "identity":
+            headers["Content-Encoding"] = coding
+        return Response(self.variants[coding], media_type=self.media_type, headers=headers)
+
+
+class StaticAssets:
+    def __init__(self, directory: str = STATIC_DIR, prefix: str = "/assets"):
+        self.directory = directory
+        self.prefix = prefix
+        self._names: Dict[str, str] = {}  # "app.css" -> "app.<hash>.css"
+        self._assets: Dict[str, Asset] = {}  # "app.css" -> Asset
+        self._pages: Dict[str, Asset] = {}
+        self._lock = threading.Lock()
+        self.built = False
+
+    def build(self):
+        """Fingerprint and precompress every text asset. Idempotent."""
+        with self._lock:
+            if self.built:
+                return
+            for name in sorted(os.listdir(self.directory)):
+                if not name.endswith(COMPRESSIBLE):
+                    continue
+                with open(os.path.join(self.directory, name), "rb") as f:
+                    body = f.read()
+                media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+                if media_type.startswith("text/") or media_type.endswith("javascript"):
+                    media_type += "; charset=utf-8"
+                asset = Asset(body, media_type)
+                stem, ext = os.path.splitext(name)
+                self._names[name] = f"{stem}.{asset.digest[:12]}{ext}"
+                self._assets[name] = asset
+            self.built = True
+
+    def url(self, name: str) -> str:
+        """Fingerprinted URL of a static asset (for templates)."""
+        self.build()
+        if name not in self._names:
+            return f"/static/{name}"
+        return f"{self.prefix}/{self._names[name]}"
+
+    def lookup(self, fingerprinted: str):
+        """
+        (asset, current) for a requested file name: `current` is False when the hash is
+        stale (an old page during a deploy), in which case the asset must not be cached forever.
+        """
+        self.build()
+        stem, ext = os.path.splitext(fingerprinted)
+        base, _, _ = stem.rpartition(".")
+        name = f"{base}{ext}" if base else fingerprinted
+        asset = self._assets.get(name)
+        if asset is None:
+            return None, False
+        return asset, self._names[name] == fingerprinted
+
+    def page(self, name: str, render: Callable[[], str]) -> Asset:
+        """A page rendered once by `render()` and then served from memory."""
+        page = self._pages.get(name)
+        if page is None:
+            page = self._pages[name] = Asset(render().encode(), "text/html; charset=utf-8")
+        return page
+
+
+static_assets = StaticAssets()
@@ -0,0 +1,119 @@
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+from starlette.datastructures import MutableHeaders
+
+SERVER_TIMING = os.getenv("SERVER_TIMING", "1") == "1"  # add a Server-Timing header to responses
+LOOP_LAG_INTERVAL = 0.1  # seconds between event-loop lag probes
+
+_spans: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("server_timing_spans", default=None)
+
+
+@contextmanager
+def span(name: str):
+    """Time a phase of the current request; free when no request is being timed."""
+    spans = _spans.get()
+    if spans is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        spans.append((name, time.perf_counter() - start))
+
+
+def _header(spans: List[Tuple[str, float]], total: float, lag: Optional[float]) -> str:
+    merged = {}
+    for name, seconds in spans:
+        merged[name] = merged.get(name, 0.0) + seconds
+    parts = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in merged.items()]
+    if lag is not None:
+        parts.append(f"loop-lag;dur={lag * 1000:.2f}")
+    parts.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(parts)
+
+
+class LoopLagMonitor:
+    """
+    Measures event-loop blocking: a task that asks to sleep LOOP_LAG_INTERVAL and
+    records how late it wakes up. `peak` is the worst lag over the last ~10 seconds.
+    """
+
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL, window: int = 100):
+        self.interval = interval
+        self._lags = deque(maxlen=window)
+        self._task: Optional[asyncio.Task] = None
+        self.log = logging.getLogger("timing")
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    @property
+    def lag(self) -> float:
+        return self._lags[-1] if self._lags else 0.0
+
+    @property
+    def peak(self) -> float:
+        return max(self._lags, default=0.0)
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = time.perf_counter() - start - self.interval
+            self._lags.append(max(lag, 0.0))
+            if lag > 1.0:
+                self.log.warning("Event loop blocked for %.2fs", lag)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+loop_lag = LoopLagMonitor()
+
+
+class ServerTimingMiddleware:
+    """
+    Pure ASGI middleware: collects the `span`s recorded while handling a request and
+    reports them, with the current event-loop lag and the total, in a Server-Timing header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not SERVER_TIMING:
+            await self.app(scope, receive, send)
+            return
+
+        spans: List[Tuple[str, float]] = []
+        token = _spans.set(spans)
+        start = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                lag = loop_lag.lag if loop_lag.running else None
+                MutableHeaders(scope=message).append("Server-Timing", _header(spans, time.perf_counter() - start, lag))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _spans.reset(token)
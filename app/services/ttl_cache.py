@@ -0,0 +1,99 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Generic, Hashable, Optional, TypeVar
+
+V = TypeVar("V")
+
+_MISSING = object()
+
+
+class TTLCache(Generic[V]):
+    """
+    Thread-safe LRU cache whose entries also expire `ttl` seconds after being set.
+    `ttl=None` keeps entries until they are evicted by size.
+
+    `pin(value)` marks entries that must never be dropped (e.g. in-flight jobs): they
+    neither expire nor get evicted while pinned, so the cache may exceed `maxsize`
+    when everything in it is pinned. Pinned entries reaching the LRU end are parked
+    outside the LRU order, and go back once found unpinned (on `get`, or in a sweep
+    every `maxsize` sets).
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None,
+                 pin: Optional[Callable[[V], bool]] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.pin = pin
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (expires_at, value)
+        self._pinned: Dict[Hashable, tuple] = {}  # parked pinned entries, same shape
+        self._sets = 0
+
+    def get(self, key: Hashable, default: Any = None):
+        with self._lock:
+            item = self._pinned.get(key, _MISSING)
+            if item is not _MISSING:
+                if self.pin(item[1]):
+                    self.hits += 1
+                    return item[1]
+                self._data[key] = self._pinned.pop(key)
+            item = self._data.get(key, _MISSING)
+            if item is not _MISSING:
+                expires_at, value = item
+                if not self._expired(expires_at, value, time.monotonic()):
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: V):
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._pinned.pop(key, None)
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            self._evict()
+
+    def _expired(self, expires_at: Optional[float], value: V, now: float) -> bool:
+        return expires_at is not None and expires_at <= now and not (self.pin and self.pin(value))
+
+    def _evict(self):
+        """Drop expired entries from the LRU end, then the least recently used until within `maxsize`."""
+        now = time.monotonic()
+        self._sets += 1
+        if self._pinned and self._sets % max(self.maxsize, 1) == 0:
+            self._unpark()
+        while self._data:
+            key, (expires_at, value) = next(iter(self._data.items()))
+            if self.pin and self.pin(value):
+                self._pinned[key] = self._data.pop(key)
+            elif len(self) > self.maxsize or self._expired(expires_at, value, now):
+                del self._data[key]
+            else:
+                break
+
+    def _unpark(self):
+        """Return parked entries that are no longer pinned to the LRU end."""
+        for key, item in list(self._pinned.items()):
+            if not self.pin(item[1]):
+                del self._pinned[key]
+                self._data[key] = item
+                self._data.move_to_end(key, last=False)
+
+    def pop(self, key: Hashable, default: Any = None):
+        with self._lock:
+            item = self._data.pop(key, _MISSING)
+            if item is _MISSING:
+                item = self._pinned.pop(key, _MISSING)
+        return default if item is _MISSING else item[1]
+
+    def __len__(self) -> int:
+        return len(self._data) + len(self._pinned)
+
+    def stats(self) -> dict:
+        return {"size": len(self), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,182 @@
+import os
+import asyncio
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+import httpx
+
+VIDEO_CACHE_DIR = os.getenv("VIDEO_CACHE_DIR", "video_cache")  # empty string disables mirroring
+VIDEO_CACHE_MAX_BYTES = int(os.getenv("VIDEO_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+
+
+class VideoCache:
+    """
+    Content-addressed on-disk mirror of generated videos.
+
+    Files live at <root>/<sha[:2]>/<sha>.mp4 and are evicted least-recently-used
+    once the directory grows past `max_bytes`. Downloads run in the background;
+    `on_stored(job_id, sha)` is called when a job's video lands on disk.
+    """
+
+    def __init__(self, root: str, max_bytes: int = VIDEO_CACHE_MAX_BYTES, workers: int = 2):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.workers = workers
+        self.on_stored = None
+        self.log = logging.getLogger("video_cache")
+
+        self._lock = threading.Lock()
+        self._lru: "OrderedDict[str, int]" = OrderedDict()  # sha -> size, oldest first
+        self._size = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks = []
+        self._client: Optional[httpx.AsyncClient] = None
+        self._downloading = set()  # job ids queued or downloading, so repeat misses don't fetch again
+
+        os.makedirs(root, exist_ok=True)
+        if not os.access(root, os.W_OK):
+            raise PermissionError(f"{root} is not writable")
+        self._scan()
+
+    def _scan(self):
+        """Rebuild the LRU index from disk, using mtime as last access."""
+        found = []
+        for dirpath, _, files in os.walk(self.root):
+            for name in files:
+                if name.endswith(".mp4"):
+                    st = os.stat(os.path.join(dirpath, name))
+                    found.append((st.st_mtime, name[:-4], st.st_size))
+        for _, sha, size in sorted(found):
+            self._lru[sha] = size
+            self._size += size
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"bytes": self._size, "files": len(self._lru), "max_bytes": self.max_bytes}
+
+    def path_for(self, sha: str) -> str:
+        return os.path.join(self.root, sha[:2], f"{sha}.mp4")
+
+    def lookup(self, sha: str) -> Optional[str]:
+        """Path of a cached video (marking it recently used), or None on a miss."""
+        with self._lock:
+            if sha not in self._lru:
+                return None
+            self._lru.move_to_end(sha)
+        path = self.path_for(sha)
+        try:
+            os.utime(path)  # persist recency across restarts
+        except FileNotFoundError:
+            self._forget(sha)
+            return None
+        return path
+
+    def _forget(self, sha: str):
+        with self._lock:
+            size = self._lru.pop(sha, None)
+            if size is not None:
+                self._size -= size
+
+    def _admit(self, sha: str, size: int):
+        evicted = []
+        with self._lock:
+            if sha not in self._lru:
+                self._size += size
+            self._lru[sha] = size
+            self._lru.move_to_end(sha)
+            while self._size > self.max_bytes and len(self._lru) > 1:
+                old, old_size = self._lru.popitem(last=False)
+                self._size -= old_size
+                evicted.append(old)
+        for old in evicted:
+            try:
+                os.remove(self.path_for(old))
+            except FileNotFoundError:
+                pass
+
+    # ---- background downloader ----
+
+    def start(self):
+        """Start download workers on the running event loop (idempotent)."""
+        if self._tasks:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._client = httpx.AsyncClient(timeout=httpx.Timeout(30.0, read=120.0), follow_redirects=True)
+        self._tasks = [self._loop.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._client:
+            await self._client.aclose()
+            self._client = None
+
+    def enqueue(self, job_id: str, url: str):
+        """Schedule a download unless one for the job is already pending. Safe to call from worker threads."""
+        if not self._loop or not self._queue:
+            return
+        with self._lock:
+            if job_id in self._downloading:
+                return
+            self._downloading.add(job_id)
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, (job_id, url))
+
+    async def _worker(self):
+        while True:
+            job_id, url = await self._queue.get()
+            try:
+                sha, size = await self._download(url)
+                self._admit(sha, size)
+                if self.on_stored:
+                    self.on_stored(job_id, sha)
+            except Exception:
+                self.log.exception("Error mirroring video for job %s", job_id)
+            finally:
+                with self._lock:
+                    self._downloading.discard(job_id)
+                self._queue.task_done()
+
+    async def _download(self, url: str) -> Tuple[str, int]:
+        """Stream `url` to a temp file while hashing it, then move it into place."""
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                async with self._client.stream("GET", url) as resp:
+                    resp.raise_for_status()
+                    async for chunk in resp.aiter_bytes(256 * 1024):
+                        digest.update(chunk)
+                        f.write(chunk)
+                        size += len(chunk)
+            sha = digest.hexdigest()
+            dest = self.path_for(sha)
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            os.replace(tmp, dest)
+            return sha, size
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+
+def build_video_cache() -> Optional[VideoCache]:
+    """
+    Video mirror configured from env, or None when VIDEO_CACHE_DIR is empty or can't
+    be written (e.g. a read-only serverless filesystem); /video then redirects to the
+    provider's URL.
+    """
+    if not VIDEO_CACHE_DIR:
+        return None
+    try:
+        return VideoCache(VIDEO_CACHE_DIR)
+    except OSError as e:
+        logging.getLogger("video_cache").warning("Video mirror disabled, %s is not usable: %s", VIDEO_CACHE_DIR, e)
+        return None
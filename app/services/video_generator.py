@@ -1,97 +1,856 @@
 import os
-from typing import Optional, Dict, Any
-from dotenv import load_dotenv
-from app.services.jobs import JobRecord, JobStore
-from app.services.prompts import compose_prompt, prompt_hash
-from app.providers.base import BaseProvider
-from app.providers.mock import MockProvider
-from app.providers.modelslab import ModelsLabProvider
-from app.providers.replicate import ReplicateProvider
-
-# Load environment variables
-load_dotenv()
+import time
+import uuid
+import asyncio
+import logging
+from typing import Optional, Dict, Any, List, AsyncIterator, Tuple
+import app.config  # noqa: F401  (loads .env)
+from app.services.jobs import JobRecord, JobStore, BaseJobStore, INFLIGHT_STATUSES, JOB_CACHE_SIZE
+from app.services.prompts import compose_prompt, prompt_hash, canonicalize_prompt, style_label
+from app.services.near_duplicates import MinHashIndex
+from app.services.video_cache import VideoCache
+from app.services.scheduler import Scheduler, QueueFull
+from app.services.routing import Router
+from app.services.eta import CompletionEstimator
+from app.services import webhooks, job_tokens
+from app.services.timing import span
+from app.services.metrics import (
+    PROVIDER_SUBMIT_SECONDS, PROVIDER_FETCH_SECONDS, JOB_SECONDS, JOB_QUEUE_SECONDS,
+    JOBS_FINISHED, SUBMIT_FAILURES, SUBMIT_THROTTLED, PROMPT_CACHE,
+)
+from app.providers.base import AsyncBaseProvider, BaseProvider, VideoJob
 
 # Global envs
 PROVIDER_NAME = os.getenv("VIDEO_PROVIDER", "replicate").lower()
+# Providers to route between, best first; defaults to VIDEO_PROVIDER alone
+PROVIDER_NAMES = [p.strip().lower() for p in os.getenv("VIDEO_PROVIDERS", PROVIDER_NAME).split(",") if p.strip()]
+POLL_INTERVAL = float(os.getenv("POLL_INTERVAL", "2.0"))  # seconds between poll cycles
+POLL_CONCURRENCY = int(os.getenv("POLL_CONCURRENCY", "8"))  # max upstream fetches in flight
+# Once a job is near its estimated completion it is polled after POLL_MIN_INTERVAL, then
+# with exponential backoff up to POLL_MAX_INTERVAL seconds
+POLL_MIN_INTERVAL = float(os.getenv("POLL_MIN_INTERVAL", "1.0"))
+POLL_MAX_INTERVAL = float(os.getenv("POLL_MAX_INTERVAL", "30.0"))
+# Consecutive transient status-fetch errors (network, 5xx) before an in-flight job is failed
+FETCH_MAX_ERRORS = int(os.getenv("FETCH_MAX_ERRORS", "5"))
+SUBMIT_MAX_ATTEMPTS = int(os.getenv("SUBMIT_MAX_ATTEMPTS", "3"))  # consecutive failures before cooling down
+SUBMIT_RETRY_COOLDOWN = float(os.getenv("SUBMIT_RETRY_COOLDOWN", "60"))  # seconds to serve the failure as-is
+# Queued jobs no worker is dispatching are requeued after this many seconds (e.g. after a crash)
+QUEUED_RECOVER_AFTER = float(os.getenv("QUEUED_RECOVER_AFTER", "300"))
+# Submitted jobs still unfinished after this many seconds are failed and free their slot (0 disables)
+JOB_MAX_AGE = float(os.getenv("JOB_MAX_AGE", "3600"))
+# Reuse a finished video for a different prompt at or above this MinHash similarity (empty disables)
+NEAR_DUP_THRESHOLD = os.getenv("NEAR_DUP_THRESHOLD", "")
 job_store = JobStore()
 
+_CACHE_HIT = PROMPT_CACHE.labels("hit")
+_CACHE_MISS = PROMPT_CACHE.labels("miss")
 
-def _build_provider() -> BaseProvider:
-    """Factory to select provider based on env"""
-    if PROVIDER_NAME == "replicate":
-        return ReplicateProvider()
-    elif PROVIDER_NAME == "modelslab":
+
+def _build_provider(name: str = PROVIDER_NAME) -> BaseProvider:
+    """
+    Factory to select provider based on env. Provider modules (and their SDKs)
+    are imported here, so only the configured ones are ever loaded.
+    """
+    if name == "modelslab":
+        from app.providers.modelslab import ModelsLabProvider
         return ModelsLabProvider()
-    elif PROVIDER_NAME == "mock":
+    elif name == "mock":
+        from app.providers.mock import MockProvider
         return MockProvider()
+    elif name == "simulator":
+        from app.providers.simulator import SimulatorProvider
+        return SimulatorProvider()
+    from app.providers.replicate import ReplicateProvider
     return ReplicateProvider()  # Default to Replicate
 
 
 class VideoGenerator:
-    """Handles video generation lifecycle across providers."""
+    """
+    Handles video generation lifecycle across providers.
+
+    Several providers can be active at once: each submission goes to the healthiest
+    one (see `Router`) and fails over to the next on a submit error. The provider
+    that served a job is recorded on its JobRecord, and polls go back to it.
+    """
 
-    def __init__(self, provider: Optional[BaseProvider] = None):
-        # provider can be passed in or built based on env
+    def __init__(self, provider=None, store: Optional[BaseJobStore] = None,
+                 video_cache: Optional[VideoCache] = None):
+        # provider can be a name ("replicate"), comma-separated names ("replicate,modelslab"),
+        # a list of names, a {name: provider} dict, a provider instance, or None for the env setting
+        if provider is None:
+            provider = PROVIDER_NAMES
         if isinstance(provider, str):
-            # if someone passes "replicate"/"modelslab"/"mock"
-            if provider == "replicate":
-                self.provider = ReplicateProvider()
-            elif provider == "modelslab":
-                self.provider = ModelsLabProvider()
-            elif provider == "mock":
-                self.provider = MockProvider()
-            else:
-                self.provider = ReplicateProvider()  # Default to Replicate
+            provider = [p.strip().lower() for p in provider.split(",") if p.strip()]
+        if isinstance(provider, (list, tuple)):
+            self.providers: Dict[str, BaseProvider] = {name: _build_provider(name) for name in provider}
+        elif isinstance(provider, dict):
+            self.providers = dict(provider)
         else:
-            self.provider = provider or _build_provider()
+            self.providers = {PROVIDER_NAME: provider}
+        self.router = Router(self.providers)
+
+        self.store = store if store is not None else job_store
+        self.log = logging.getLogger("video_generator")
+        self._poll_task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._watchers: Dict[str, List[asyncio.Queue]] = {}
+        self.scheduler = Scheduler(self._dispatch)
+        self._retired: Dict[str, BaseProvider] = {}
+        self._slots: Dict[str, str] = {}  # job id -> provider, for jobs holding one of this process's in-flight slots
+
+        self.eta = CompletionEstimator()
+        self._poll_plan: Dict[str, list] = {}  # job id -> [next poll at, polls so far, last poll at]
+        self._fetch_errors: Dict[str, int] = {}  # job id -> consecutive transient fetch errors
+        self.poll_stats = {"fetches": 0, "deferred": 0}
+
+        # bounded like the job store, and refilled from it (see `_sync_near_dups`)
+        self.near_dups = MinHashIndex(float(NEAR_DUP_THRESHOLD), maxsize=JOB_CACHE_SIZE) if NEAR_DUP_THRESHOLD else None
+        self._near_dups_synced = 0.0  # store writes up to this time (epoch seconds) are indexed
+        self._near_dups_next_sync = 0.0
+        # generations avoided, by reason
+        self.savings = {"exact": 0, "near_duplicate": 0, "coalesced": 0}
+
+        self.video_cache = video_cache
+        if video_cache:
+            video_cache.on_stored = self._mirrored
+
+    @property
+    def provider_name(self) -> str:
+        """The default (first configured) provider."""
+        return self.router.names[0]
 
-    def submit(
+    @property
+    def provider(self) -> BaseProvider:
+        return self.providers[self.provider_name]
+
+    @property
+    def model(self) -> str:
+        return self.model_of(self.provider_name)
+
+    def model_of(self, name: str) -> str:
+        return getattr(self.providers.get(name), "model", None) or ""
+
+    def _provider(self, name: str) -> BaseProvider:
+        """Provider for a stored job; jobs from a provider no longer routed to are still polled."""
+        provider = self.providers.get(name)
+        if provider is None:
+            provider = self._retired[name] = self._retired.get(name) or _build_provider(name)
+        return provider
+
+    async def asubmit(
         self,
         user_prompt: str,
         style: str = "cinematic",
         options: Optional[Dict[str, Any]] = None,
-    ):
+        priority: str = "interactive",
+    ) -> JobRecord:
         """
-        Submit a video generation request.
-        Returns a ProviderJob object with job_id, status, etc.
+        Queue a video generation request and return its JobRecord right away.
+        Returns a cached record on prompt-hash hits, or the pending record when an
+        identical request is already queued or in flight. The job goes to the
+        best-ranked provider with queue room; raises QueueFull when none has any.
         """
         if not user_prompt.strip():
             raise ValueError("Prompt is required")
 
-        h = prompt_hash(user_prompt, style)
-        cached = job_store.get_by_hash(h)
+        with span("hash"):
+            h = prompt_hash(user_prompt, style)
+        with span("cache"):
+            # a prompt with nothing left to compare (e.g. "!!!") never shares another's video
+            reuse = self._reusable(h, user_prompt, style) if canonicalize_prompt(user_prompt) else None
+        if reuse:
+            return reuse
+
+        with span("route"):
+            provider = self._route()
+        with span("store"):
+            return self._enqueue(h, user_prompt, style, options, priority, provider)
+
+    async def submit_group(
+        self,
+        items: List[Tuple[str, str]],
+    ) -> Tuple[str, List[JobRecord]]:
+        """
+        Queue (prompt, style) items as one job group at batch priority.
+        Identical items and cache hits share a job. Returns (group_id, records in item order).
+        Raises QueueFull, without queueing anything, if the batch does not fit.
+        """
+        fresh = {prompt_hash(p, st) for p, st in items}
+        if sum(self.scheduler.room(name) for name in self.providers) < len(fresh):
+            raise QueueFull(self.provider_name, min(self.scheduler.retry_hint(n) for n in self.providers))
+
+        recs = [await self.asubmit(p, st, priority="batch") for p, st in items]
+        group_id = f"grp-{uuid.uuid4().hex[:16]}"
+        self.store.put_group(group_id, [r.job_id for r in recs])
+        return group_id, recs
+
+    def _route(self, tried: Tuple[str, ...] = ()) -> str:
+        """Best-ranked provider not in `tried` whose queue has room."""
+        ranked = self.router.ranked(exclude=tried)
+        for name in ranked:
+            if self.scheduler.room(name) > 0:
+                return name
+        raise QueueFull(ranked[0] if ranked else self.provider_name,
+                        min((self.scheduler.retry_hint(n) for n in ranked), default=1.0))
+
+    # ---- result reuse ----
+
+    def _reusable(self, h: str, user_prompt: str, style: str) -> Optional[JobRecord]:
+        """
+        Record an identical request can share instead of paying for a new submission:
+        - a succeeded record (from any provider) is a cache hit;
+        - otherwise, with the near-duplicate index enabled, a succeeded record for a
+          similar enough prompt in the same style;
+        - a queued/processing record on a routed provider, with that provider's current model, is joined;
+        - a failed record is retried, unless SUBMIT_MAX_ATTEMPTS consecutive attempts
+          have failed within SUBMIT_RETRY_COOLDOWN seconds, in which case it is returned as-is.
+        """
+        rec = self.store.get_by_hash(h)
+        if rec and rec.status == "succeeded":
+            _CACHE_HIT.inc()
+            self.savings["exact"] += 1
+            return rec
+        _CACHE_MISS.inc()
 
-        if cached and cached.status == "succeeded":
-            return cached  # return JobRecord directly
+        near = self._near_duplicate(h, user_prompt, style)
+        if near:
+            self.savings["near_duplicate"] += 1
+            return near
+
+        if not rec:
+            return None
+        if rec.provider not in self.providers or rec.meta.get("model", "") != self.model_of(rec.provider):
+            return None
+        if rec.status in INFLIGHT_STATUSES:
+            self.savings["coalesced"] += 1
+            return rec
+        if rec.status == "failed":
+            attempts = int(rec.meta.get("attempts", "1"))
+            failed_at = float(rec.meta.get("failed_at", "0"))
+            if attempts >= SUBMIT_MAX_ATTEMPTS and time.time() - failed_at < SUBMIT_RETRY_COOLDOWN:
+                return rec
+        return None
+
+    def _near_duplicate(self, h: str, user_prompt: str, style: str) -> Optional[JobRecord]:
+        if self.near_dups is None:
+            return None
+        for other, _ in self.near_dups.query(canonicalize_prompt(user_prompt), style, exclude=h):
+            rec = self.store.get_by_hash(other)
+            if rec is None:
+                self.near_dups.remove(other)  # evicted from the store
+            elif rec.status == "succeeded":
+                return rec
+        return None
+
+    def _index_near_dup(self, rec: JobRecord):
+        canonical = canonicalize_prompt(rec.meta.get("prompt", ""))
+        if self.near_dups is not None and rec.prompt_hash and canonical:
+            self.near_dups.add(rec.prompt_hash, canonical, rec.meta.get("style", "cinematic"))
+
+    def _sync_near_dups(self):
+        """
+        Index videos other workers finished in a shared store; the first sync rebuilds
+        the index after a restart. At most once per POLL_INTERVAL.
+        """
+        if self.near_dups is None or time.monotonic() < self._near_dups_next_sync:
+            return
+        self._near_dups_next_sync = time.monotonic() + POLL_INTERVAL
+        started = time.time()
+        for rec in reversed(self.store.succeeded_since(self._near_dups_synced, self.near_dups.maxsize)):
+            self._index_near_dup(rec)
+        # overlap a little: workers stamp rows with their own clocks when they flush
+        self._near_dups_synced = started - 5.0
 
-        final_prompt = compose_prompt(user_prompt, style)
-        job = self.provider.submit(final_prompt, options={"style": style, **(options or {})})
+    # ---- queued submission ----
+
+    def _enqueue(self, h: str, user_prompt: str, style: str,
+                 options: Optional[Dict[str, Any]], priority: str, provider: str) -> JobRecord:
+        """
+        Store a queued record under a local job id and hand it to the scheduler.
+        There is no await between `_reusable` and the put, so identical requests
+        arriving later join this record instead of queueing their own.
+        """
+        prev = self.store.get_by_hash(h)
+        attempts = 1
+        if prev and prev.status == "failed" and prev.provider in self.providers:
+            attempts = int(prev.meta.get("attempts", "1")) + 1
 
         rec = JobRecord(
-            job_id=job.job_id,
-            status=job.status,
+            job_id=uuid.uuid4().hex[:16],
+            status="queued",
             video_path=None,
-            provider=PROVIDER_NAME,
+            provider=provider,
             prompt_hash=h,
+            meta={
+                "model": self.model_of(provider),
+                "attempts": str(attempts),
+                "prompt": user_prompt,
+                "style": style,
+                "priority": priority,
+                "queued_at": str(time.time()),
+            },
         )
-        job_store.put(rec)
-        return job
+        if options:
+            rec.meta["options"] = options
+        self.store.put(rec)
+        self.scheduler.enqueue(rec.job_id, provider, priority)
+        return rec
 
-    def fetch(self, job_id: str):
+    async def _dispatch(self, job_id: str, provider: str, waited: float) -> Optional[float]:
         """
-        Check job status and update store.
-        Returns a ProviderJob with latest status.
+        Scheduler callback: submit a queued job upstream.
+        Returns the provider's Retry-After when it throttled us, so the job is requeued.
+        A submit error moves the job to the next-ranked provider not tried yet.
         """
-        pj = self.provider.fetch(job_id)
-        rec = job_store.get(job_id)
+        rec = self.store.get(job_id)
+        if not rec or rec.status != "queued":
+            self.scheduler.release(provider)
+            return None
 
-        if not rec:
-            return pj
+        style = rec.meta.get("style", "cinematic")
+        final_prompt = compose_prompt(rec.meta.get("prompt", ""), style)
+        options = {"style": style, **rec.meta.get("options", {})}
+        backend = self._provider(provider)
+        callback = webhooks.webhook_url(provider, job_id)
+        if callback:
+            options["webhook"] = callback
+        started = time.monotonic()
+        try:
+            if isinstance(backend, AsyncBaseProvider):
+                job = await backend.asubmit(final_prompt, options=options)
+            else:
+                job = await asyncio.to_thread(backend.submit, final_prompt, options)
+        except Exception as e:
+            self.log.exception("Error submitting job %s to %s", job_id, provider)
+            job = VideoJob("n/a", status="failed", error=str(e))
+
+        elapsed = time.monotonic() - started
+        PROVIDER_SUBMIT_SECONDS.labels(provider).observe(elapsed)
+        if job.retry_after is not None:
+            SUBMIT_THROTTLED.labels(provider).inc()
+            return job.retry_after
+
+        self.router.record_submit(provider, elapsed, ok=not job.error)
+        JOB_QUEUE_SECONDS.labels(provider).observe(waited)
+        rec.meta["queue_wait_ms"] = str(int(waited * 1000))
+        if job.error:
+            SUBMIT_FAILURES.labels(provider).inc()
+            self.scheduler.release(provider)
+            if self._failover(rec, provider, job.error):
+                return None
+            rec.status = "failed"
+            rec.meta["error"] = job.error
+            rec.meta["failed_at"] = str(time.time())
+            JOBS_FINISHED.labels(provider, "failed").inc()
+        else:
+            self._slots[job_id] = provider
+            rec.status = "processing"
+            rec.meta["upstream_id"] = job.job_id
+            rec.meta["submitted_at"] = str(time.time())
+            rec.meta.update(backend.generation_params(options))
+            if callback:
+                rec.meta["webhook"] = "1"
+        self.store.put(rec)
+        if rec.status == "processing":
+            # write the upstream id through: if it were lost in a crash, recovery would pay for the job again
+            self.store.flush()
+        self._notify(rec)
+        return None
+
+    def _failover(self, rec: JobRecord, provider: str, error: str) -> bool:
+        """Requeue a job whose submission failed on the next provider; False when none is left."""
+        tried = tuple(filter(None, rec.meta.get("tried", "").split(","))) + (provider,)
+        try:
+            nxt = self._route(tried)
+        except QueueFull:
+            return False
+        self.log.warning("Submit to %s failed (%s); failing over job %s to %s", provider, error, rec.job_id, nxt)
+        rec.provider = nxt
+        rec.meta["model"] = self.model_of(nxt)
+        rec.meta["tried"] = ",".join(tried)
+        self.store.put(rec)
+        self.scheduler.enqueue(rec.job_id, nxt, rec.meta.get("priority", "interactive"))
+        return True
+
+    def queue_info(self, rec: JobRecord) -> Optional[dict]:
+        """Queue depth and time waited so far for a job that has not reached the provider yet."""
+        if rec.status != "queued":
+            return None
+        stats = self.scheduler.stats(rec.provider)
+        waited = time.time() - float(rec.meta.get("queued_at", time.time()))
+        return {"depth": stats["depth"], "waited_ms": int(waited * 1000), "avg_wait_ms": stats["avg_wait_ms"]}
+
+    # ---- upstream status ----
+
+    def fetch(self, job_id: str) -> Optional[VideoJob]:
+        """
+        Check job status upstream and update store.
+        Returns a ProviderJob with latest status, or None if the job is unknown or still queued.
+        """
+        rec = self.store.get(job_id)
+        if not rec or rec.status == "queued":
+            return None
+        started = time.monotonic()
+        pj = self._provider(rec.provider).fetch(self._upstream_id(rec))
+        PROVIDER_FETCH_SECONDS.labels(rec.provider).observe(time.monotonic() - started)
+        self._apply(rec, pj)
+        return pj
+
+    async def afetch(self, job_id: str) -> Optional[VideoJob]:
+        """Like `fetch`, but never blocks the event loop."""
+        rec = self.store.get(job_id)
+        if not rec or rec.status == "queued":
+            return None
+        backend = self._provider(rec.provider)
+        started = time.monotonic()
+        if isinstance(backend, AsyncBaseProvider):
+            pj = await backend.afetch(self._upstream_id(rec))
+        else:
+            pj = await asyncio.to_thread(backend.fetch, self._upstream_id(rec))
+        PROVIDER_FETCH_SECONDS.labels(rec.provider).observe(time.monotonic() - started)
+        self._apply(rec, pj)
+        return pj
+
+    # ---- stateless job tokens ----
+
+    def token_for(self, rec: JobRecord) -> Optional[str]:
+        """Signed job token for a job its provider already knows about; None when tokens are off."""
+        upstream_id = rec.meta.get("upstream_id")
+        if not job_tokens.enabled() or not upstream_id or rec.status == "failed":
+            return None
+        return job_tokens.issue(rec.provider, upstream_id, rec.prompt_hash or "", rec.meta.get("style", ""))
+
+    async def wait_submitted(self, rec: JobRecord, timeout: float) -> JobRecord:
+        """Wait up to `timeout` seconds for a queued job to reach its provider; returns the latest record."""
+        if rec.status != "queued":
+            return rec
+
+        async def _submitted():
+            async for latest in self.watch(rec.job_id, heartbeat=timeout):
+                if latest is not None and latest.status != "queued":
+                    return latest
+            return None
+
+        try:
+            latest = await asyncio.wait_for(_submitted(), timeout)
+        except asyncio.TimeoutError:
+            latest = None
+        return latest or self.store.get(rec.job_id) or rec
+
+    def resolve_token(self, tok: job_tokens.JobToken) -> Optional[JobRecord]:
+        """The stored record a token names, when this worker (or a shared store) has it."""
+        rec = self.store.get_by_hash(tok.prompt_hash)
+        if rec and rec.provider == tok.provider and rec.meta.get("upstream_id") == tok.upstream_id:
+            return rec
+        return None
+
+    def fetch_token(self, tok: job_tokens.JobToken) -> VideoJob:
+        """Ask the token's provider directly; nothing is read from or written to the store."""
+        started = time.monotonic()
+        pj = self._provider(tok.provider).fetch(tok.upstream_id)
+        PROVIDER_FETCH_SECONDS.labels(tok.provider).observe(time.monotonic() - started)
+        return pj
+
+    async def afetch_token(self, tok: job_tokens.JobToken) -> VideoJob:
+        """Like `fetch_token`, but never blocks the event loop."""
+        backend = self._provider(tok.provider)
+        started = time.monotonic()
+        if isinstance(backend, AsyncBaseProvider):
+            pj = await backend.afetch(tok.upstream_id)
+        else:
+            pj = await asyncio.to_thread(backend.fetch, tok.upstream_id)
+        PROVIDER_FETCH_SECONDS.labels(tok.provider).observe(time.monotonic() - started)
+        return pj
 
-        rec.status = pj.status
+    @staticmethod
+    def _upstream_id(rec: JobRecord) -> str:
+        # records created before local job ids used the provider's id directly
+        return rec.meta.get("upstream_id") or rec.job_id
+
+    def _apply(self, rec: JobRecord, pj: VideoJob):
+        """
+        Write a provider result into the JobRecord. A transient fetch error leaves the
+        job in flight (the poller backs off) until FETCH_MAX_ERRORS of them in a row.
+        """
+        if pj.transient:
+            errors = self._fetch_errors[rec.job_id] = self._fetch_errors.get(rec.job_id, 0) + 1
+            if errors < FETCH_MAX_ERRORS:
+                self.log.warning("Transient error fetching job %s (%d/%d): %s",
+                                 rec.job_id, errors, FETCH_MAX_ERRORS, pj.error)
+                return
+        self._fetch_errors.pop(rec.job_id, None)
+
+        before = (rec.status, rec.video_path)
+        if pj.error:
+            rec.status = "failed"
+            rec.meta["error"] = pj.error
+            rec.meta.setdefault("failed_at", str(time.time()))
+        else:
+            rec.status = pj.status
         if pj.status == "succeeded" and not rec.video_path:
-            rec.video_path = f"/video/{job_id}"
+            rec.video_path = f"/video/{rec.job_id}"
             if pj.video_url:
                 rec.meta["provider_output_url"] = pj.video_url
+        if (rec.status, rec.video_path) != before:
+            self.store.put(rec)
+            self._notify(rec)
+            if rec.status not in INFLIGHT_STATUSES:
+                self._finished(rec)
+            if rec.status == "succeeded" and self.video_cache and pj.video_url:
+                self.video_cache.enqueue(rec.job_id, pj.video_url)
 
-        return pj
+    def _finished(self, rec: JobRecord):
+        """Feed a job that just reached a terminal status back into scheduling, routing, ETAs and reuse."""
+        JOBS_FINISHED.labels(rec.provider, rec.status).inc()
+        if rec.status == "succeeded":
+            self._index_near_dup(rec)
+            if "queued_at" in rec.meta:
+                JOB_SECONDS.labels(rec.provider, style_label(rec.meta.get("style", ""))).observe(
+                    time.time() - float(rec.meta["queued_at"]))
+
+        took = None
+        if rec.status == "succeeded" and "submitted_at" in rec.meta:
+            took, exact = self._completion_time(rec)
+            if exact:
+                self.eta.observe(self._eta_key(rec), took)
+            else:
+                self.eta.observe_upper(self._eta_key(rec), took)
+        self._poll_plan.pop(rec.job_id, None)
+
+        slot = self._slots.pop(rec.job_id, None)
+        if slot is not None:
+            self.scheduler.release(slot)
+            if took is not None:
+                self.router.record_completion(rec.provider, took)
+            elif rec.status == "failed":
+                self.router.record_failure(rec.provider)
+
+    def apply_webhook(self, provider: str, job_id: str, payload: Dict[str, Any]) -> Optional[JobRecord]:
+        """
+        Apply a (verified) completion callback to its job; None if it matches no job.
+        The body must name the upstream prediction the job is waiting on.
+        """
+        rec = self.store.get(job_id)
+        if not rec or rec.provider != provider:
+            return None
+        pj = self._provider(provider).parse_webhook(payload)
+        if pj is None or pj.job_id != self._upstream_id(rec):
+            return None
+        if rec.status in INFLIGHT_STATUSES:
+            self._poll_plan.pop(rec.job_id, None)  # a callback arrives on completion, not at the next poll
+            self._apply(rec, pj)
+        return rec
+
+    # ---- completion estimates ----
+
+    @staticmethod
+    def _eta_key(rec: JobRecord):
+        m = rec.meta
+        return (rec.provider, m.get("model", ""), style_label(m.get("style", "")),
+                m.get("duration", ""), m.get("aspect_ratio", ""))
+
+    def _completion_time(self, rec: JobRecord) -> Tuple[float, bool]:
+        """
+        (seconds from submission to completion, exact). The job finished somewhere between
+        the previous poll and now, so take the midpoint rather than let sparse polling
+        inflate it. Found finished on its first poll, the time is only an upper bound.
+        """
+        now = time.time()
+        submitted = float(rec.meta["submitted_at"])
+        plan = self._poll_plan.get(rec.job_id)
+        if plan is None:
+            return max(now - submitted, 0.0), True  # a webhook, or a fetch outside the poller
+        if not plan[1]:
+            return max(now - submitted, 0.0), False
+        return max((plan[2] + now) / 2 - submitted, 0.0), True
+
+    def eta_remaining(self, rec: JobRecord) -> Optional[float]:
+        """Estimated seconds until a processing job finishes (0 once overdue), or None."""
+        if rec.status != "processing" or "submitted_at" not in rec.meta:
+            return None
+        mean, _ = self.eta.estimate(self._eta_key(rec))
+        return max(float(rec.meta["submitted_at"]) + mean - time.time(), 0.0)
+
+    def _poll_due(self, rec: JobRecord, now: float) -> bool:
+        """
+        Whether a processing job should be reloaded upstream this cycle.
+        Nothing is fetched until the job is within one deviation of its estimated
+        completion; after that each poll that finds it unfinished doubles the wait.
+        Until some job like it has completed there is no estimate, and polling starts
+        at POLL_MIN_INTERVAL. Jobs with a completion webhook are only polled once it
+        looks overdue.
+        """
+        plan = self._poll_plan.get(rec.job_id)
+        if plan is None:
+            submitted = float(rec.meta.get("submitted_at", now))
+            key = self._eta_key(rec)
+            mean, dev = self.eta.estimate(key)
+            if rec.meta.get("webhook"):
+                wait = mean + 4 * dev + POLL_MAX_INTERVAL
+            else:
+                wait = mean - dev if self.eta.learned(key) else POLL_MIN_INTERVAL
+            plan = self._poll_plan[rec.job_id] = [submitted + max(wait, POLL_MIN_INTERVAL), 0, submitted]
+        return plan[0] <= now
+
+    def _polled(self, job_id: str, now: float):
+        plan = self._poll_plan.get(job_id)
+        if plan is not None:
+            plan[1] += 1
+            plan[2] = now
+            plan[0] = now + min(POLL_MIN_INTERVAL * 2 ** (plan[1] - 1), POLL_MAX_INTERVAL)
+
+    # ---- local video mirror ----
+
+    def _mirrored(self, job_id: str, sha: str):
+        rec = self.store.get(job_id)
+        if rec:
+            rec.meta["video_sha256"] = sha
+            self.store.put(rec)
+
+    def local_video(self, rec: JobRecord) -> Optional[str]:
+        """
+        Path of the job's mirrored video, or None on a cache miss.
+        A miss on a finished job schedules the download again.
+        """
+        if not self.video_cache:
+            return None
+        sha = rec.meta.get("video_sha256")
+        path = self.video_cache.lookup(sha) if sha else None
+        if path is None and rec.meta.get("provider_output_url"):
+            self.video_cache.enqueue(rec.job_id, rec.meta["provider_output_url"])
+        return path
+
+    # ---- change notifications ----
+
+    def _notify(self, rec: JobRecord):
+        """Wake every watcher of this job. Safe to call from worker threads."""
+        queues = self._watchers.get(rec.job_id)
+        if not queues or not self._loop:
+            return
+        for q in queues:
+            self._loop.call_soon_threadsafe(q.put_nowait, rec)
+
+    async def watch(self, job_id: str, heartbeat: float = 15.0) -> AsyncIterator[Optional[JobRecord]]:
+        """
+        Yield the job's record now and again whenever its status changes.
+        Yields None every `heartbeat` seconds of silence; stops after a terminal status.
+        """
+        self._loop = asyncio.get_running_loop()
+        q: asyncio.Queue = asyncio.Queue()
+        self._watchers.setdefault(job_id, []).append(q)
+        try:
+            rec = self.store.get(job_id)
+            if rec is None:
+                return
+            while True:
+                yield rec
+                if rec.status not in INFLIGHT_STATUSES:
+                    return
+                last, quiet = (rec.status, rec.video_path), 0.0
+                while True:
+                    try:
+                        rec = await asyncio.wait_for(q.get(), POLL_INTERVAL)
+                        break
+                    except asyncio.TimeoutError:
+                        # another worker may own the job in a shared store
+                        rec = self.store.get(job_id)
+                        if rec is not None and (rec.status, rec.video_path) != last:
+                            break
+                        quiet += POLL_INTERVAL
+                        if quiet >= heartbeat:
+                            quiet = 0.0
+                            yield None
+                if rec is None:
+                    return
+        finally:
+            queues = self._watchers.get(job_id, [])
+            if q in queues:
+                queues.remove(q)
+            if not queues:
+                self._watchers.pop(job_id, None)
+
+    async def wait_changed(self, job_id: str, since: int, timeout: float) -> Optional[JobRecord]:
+        """
+        Long-poll: return the job's record as soon as its version differs from `since`,
+        or the unchanged record once `timeout` seconds pass. None if the job is unknown.
+        """
+        self._loop = asyncio.get_running_loop()
+        q: asyncio.Queue = asyncio.Queue()
+        self._watchers.setdefault(job_id, []).append(q)
+        deadline = self._loop.time() + timeout
+        try:
+            while True:
+                rec = self.store.get(job_id)
+                remaining = deadline - self._loop.time()
+                if rec is None or rec.version != since or remaining <= 0:
+                    return rec
+                try:
+                    # woken by local updates; the periodic recheck catches other workers' in a shared store
+                    await asyncio.wait_for(q.get(), min(remaining, POLL_INTERVAL))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            queues = self._watchers.get(job_id, [])
+            if q in queues:
+                queues.remove(q)
+            if not queues:
+                self._watchers.pop(job_id, None)
+
+    async def watch_group(self, job_ids: List[str], heartbeat: float = 15.0) -> AsyncIterator[Optional[List[JobRecord]]]:
+        """
+        Like `watch` for several jobs at once: yields all member records now and
+        again whenever any of them changes, until every member is terminal.
+        """
+        self._loop = asyncio.get_running_loop()
+        q: asyncio.Queue = asyncio.Queue()
+        ids = list(dict.fromkeys(job_ids))
+        for job_id in ids:
+            self._watchers.setdefault(job_id, []).append(q)
+
+        def _snapshot():
+            recs = [self.store.get(job_id) for job_id in job_ids]
+            return recs, [(r.status, r.video_path) if r else None for r in recs]
+
+        try:
+            recs, last = _snapshot()
+            quiet = 0.0
+            while True:
+                yield recs
+                if all(r is None or r.status not in INFLIGHT_STATUSES for r in recs):
+                    return
+                while True:
+                    try:
+                        await asyncio.wait_for(q.get(), POLL_INTERVAL)
+                    except asyncio.TimeoutError:
+                        quiet += POLL_INTERVAL
+                    recs, current = _snapshot()
+                    if current != last:
+                        last, quiet = current, 0.0
+                        break
+                    if quiet >= heartbeat:
+                        quiet = 0.0
+                        yield None
+        finally:
+            for job_id in ids:
+                queues = self._watchers.get(job_id, [])
+                if q in queues:
+                    queues.remove(q)
+                if not queues:
+                    self._watchers.pop(job_id, None)
+
+    # ---- background poller ----
+
+    async def poll_once(self, concurrency: int = POLL_CONCURRENCY):
+        """
+        Refresh every in-flight job whose poll is due (see `_poll_due`) in one cycle.
+        At most `concurrency` upstream fetches are in flight at a time.
+        """
+        pending = []
+        now = time.time()
+        inflight = self.store.inflight()
+        live = {rec.job_id for rec in inflight}
+        for job_id in [j for j in self._poll_plan if j not in live]:
+            del self._poll_plan[job_id]  # finished elsewhere or now polled by another worker
+            self._fetch_errors.pop(job_id, None)
+        self._release_finished_elsewhere(live)
+        for rec in inflight:
+            if rec.status != "queued":
+                if self._expired(rec, now):
+                    self._apply(rec, VideoJob(self._upstream_id(rec), status="failed",
+                                              error=f"No result after {JOB_MAX_AGE:.0f}s"))
+                elif self._poll_due(rec, now):
+                    pending.append(rec)
+                else:
+                    self.poll_stats["deferred"] += 1
+            elif not self.scheduler.tracks(rec.job_id):
+                queued_at = float(rec.meta.get("queued_at", "0"))
+                if time.time() - queued_at >= QUEUED_RECOVER_AFTER:
+                    self._requeue(rec)
+        if not pending:
+            return
+
+        sem = asyncio.Semaphore(concurrency)
+
+        async def _refresh(rec: JobRecord):
+            async with sem:
+                try:
+                    self.poll_stats["fetches"] += 1
+                    await self.afetch(rec.job_id)
+                except Exception:
+                    self.log.exception("Error polling job %s", rec.job_id)
+                self._polled(rec.job_id, time.time())
+
+        await asyncio.gather(*(_refresh(rec) for rec in pending))
+
+    @staticmethod
+    def _expired(rec: JobRecord, now: float) -> bool:
+        """True once a submitted job has run past JOB_MAX_AGE (e.g. stuck upstream)."""
+        submitted = rec.meta.get("submitted_at")
+        return bool(JOB_MAX_AGE) and submitted is not None and now - float(submitted) >= JOB_MAX_AGE
+
+    def _release_finished_elsewhere(self, live):
+        """
+        Free the slots of jobs this process submitted that finished without passing through
+        its `_apply`: polled by the worker holding the lease, or completed by a webhook
+        delivered to another worker.
+        """
+        for job_id in [j for j in self._slots if j not in live]:
+            rec = self.store.get(job_id)
+            if rec is None or rec.status not in INFLIGHT_STATUSES:
+                self.scheduler.release(self._slots.pop(job_id))
+
+    def _requeue(self, rec: JobRecord):
+        """Hand a queued job left behind by a stopped worker back to the scheduler."""
+        if self.scheduler.room(rec.provider) <= 0:
+            return
+        rec.meta["queued_at"] = str(time.time())
+        self.store.put(rec)
+        self.scheduler.enqueue(rec.job_id, rec.provider, rec.meta.get("priority", "batch"))
+
+    async def _poll_loop(self, interval: float, concurrency: int):
+        while True:
+            try:
+                await self.poll_once(concurrency)
+                self.store.flush()
+                self._sync_near_dups()
+            except Exception:
+                self.log.exception("Poll cycle failed")
+            # wake early for the next poll that falls due; `interval` still bounds the cycle
+            # so new jobs are picked up and store leases renewed
+            due = min((plan[0] for plan in self._poll_plan.values()), default=None)
+            delay = interval if due is None else min(interval, max(due - time.time(), 0.05))
+            await asyncio.sleep(delay)
+
+    def start(self):
+        """Start the submission scheduler and the background poller on the running event loop."""
+        self.scheduler.start()
+        self.start_poller()
+
+    def start_poller(self, interval: float = POLL_INTERVAL, concurrency: int = POLL_CONCURRENCY):
+        """Start the background poller on the running event loop (idempotent)."""
+        if self._poll_task and not self._poll_task.done():
+            return
+        self._loop = asyncio.get_running_loop()
+        if self.video_cache:
+            self.video_cache.start()
+        self._poll_task = asyncio.get_running_loop().create_task(self._poll_loop(interval, concurrency))
+
+    async def stop_poller(self):
+        if not self._poll_task:
+            return
+        self._poll_task.cancel()
+        try:
+            await self._poll_task
+        except asyncio.CancelledError:
+            pass
+        self._poll_task = None
+
+    async def aclose(self):
+        """Stop scheduling and polling, and release the providers' pooled connections."""
+        await self.scheduler.stop()
+        await self.stop_poller()
+        if self.video_cache:
+            await self.video_cache.stop()
+        for backend in [*self.providers.values(), *self._retired.values()]:
+            if isinstance(backend, AsyncBaseProvider):
+                await backend.aclose()
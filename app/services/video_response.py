@@ -0,0 +1,224 @@
+import os
+import stat
+import uuid
+from email.utils import formatdate, parsedate_to_datetime
+from typing import List, Mapping, Optional, Tuple
+import anyio
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+CHUNK_SIZE = 1024 * 1024  # fallback read size when the server cannot sendfile
+MAX_RANGES = 16  # more than this and we just send the whole file
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_ranges(range_header: Optional[str], file_size: int) -> Optional[List[Tuple[int, int]]]:
+    """
+    Parse a `bytes=` Range header into sorted, merged (start, end) pairs clamped to the file.
+    Returns None when the header is absent or malformed (serve the whole file)
+    and raises RangeNotSatisfiable when no range overlaps the file.
+    """
+    if not range_header or "=" not in range_header:
+        return None
+    units, spec = range_header.split("=", 1)
+    if units.strip().lower() != "bytes":
+        return None
+
+    ranges = []
+    for part in spec.split(","):
+        start_s, sep, end_s = part.strip().partition("-")
+        if not sep:
+            return None
+        try:
+            if start_s:
+                start = int(start_s)
+                end = min(int(end_s), file_size - 1) if end_s else file_size - 1
+                if start > int(end_s or start):
+                    return None
+            else:
+                n = int(end_s)
+                start, end = max(file_size - n, 0), file_size - 1
+                if n == 0:
+                    continue
+        except ValueError:
+            return None
+        if start < 0:
+            return None
+        if start < file_size:
+            ranges.append((start, end))
+
+    if not ranges:
+        raise RangeNotSatisfiable()
+    if len(ranges) > MAX_RANGES:
+        return None
+
+    ranges.sort()
+    merged = [ranges[0]]
+    for start, end in ranges[1:]:
+        last_start, last_end = merged[-1]
+        if start <= last_end + 1:
+            merged[-1] = (last_start, max(last_end, end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _etag_matches(header: str, etag: str, weak: bool) -> bool:
+    if header.strip() == "*":
+        return True
+    for tag in header.split(","):
+        tag = tag.strip()
+        if weak:
+            if tag.removeprefix("W/") == etag:
+                return True
+        elif tag == etag:
+            return True
+    return False
+
+
+class VideoFileResponse(Response):
+    """
+    File response with strong ETags, conditional requests (If-None-Match / If-Range),
+    single and multipart/byteranges Range support.
+
+    The body is handed to the server as a zero-copy send when it offers the ASGI
+    `http.response.zerocopysend` or `http.response.pathsend` extension; otherwise
+    it is read in large chunks off the event loop.
+    """
+
+    def __init__(self, path: str, request_headers: Mapping[str, str],
+                 media_type: str = "video/mp4", etag: Optional[str] = None,
+                 cache_control: Optional[str] = None):
+        self.path = path
+        self.media_type = media_type
+        self.background = None
+        st = os.stat(path)
+        if not stat.S_ISREG(st.st_mode):
+            raise FileNotFoundError(path)
+        self.file_size = st.st_size
+        self.etag = f'"{etag}"' if etag else f'"{st.st_ino:x}-{st.st_mtime_ns:x}-{st.st_size:x}"'
+        last_modified = formatdate(st.st_mtime, usegmt=True)
+
+        headers = {
+            "accept-ranges": "bytes",
+            "etag": self.etag,
+            "last-modified": last_modified,
+        }
+        if cache_control:
+            headers["cache-control"] = cache_control
+
+        self.ranges: Optional[List[Tuple[int, int]]] = None
+        self.boundary: Optional[str] = None
+        self.parts: List[Tuple[bytes, int, int]] = []  # (part header, start, end)
+
+        inm = request_headers.get("if-none-match")
+        if inm and _etag_matches(inm, self.etag, weak=True):
+            self.status_code = 304
+            self.init_headers(headers)
+            return
+
+        range_header = request_headers.get("range")
+        if_range = request_headers.get("if-range")
+        if range_header and if_range and not self._if_range_ok(if_range, st.st_mtime):
+            range_header = None
+
+        try:
+            self.ranges = parse_ranges(range_header, self.file_size)
+        except RangeNotSatisfiable:
+            self.status_code = 416
+            headers["content-range"] = f"bytes */{self.file_size}"
+            headers["content-length"] = "0"
+            self.init_headers(headers)
+            return
+
+        if not self.ranges:
+            self.status_code = 200
+            headers["content-length"] = str(self.file_size)
+        elif len(self.ranges) == 1:
+            start, end = self.ranges[0]
+            self.status_code = 206
+            headers["content-range"] = f"bytes {start}-{end}/{self.file_size}"
+            headers["content-length"] = str(end - start + 1)
+        else:
+            self.status_code = 206
+            self.boundary = uuid.uuid4().hex
+            length = 0
+            for start, end in self.ranges:
+                head = (
+                    f"--{self.boundary}\r\n"
+                    f"Content-Type: {media_type}\r\n"
+                    f"Content-Range: bytes {start}-{end}/{self.file_size}\r\n\r\n"
+                ).encode("latin-1")
+                self.parts.append((head, start, end))
+                length += len(head) + (end - start + 1) + 2
+            length += len(self._closing)
+            self.media_type = f"multipart/byteranges; boundary={self.boundary}"
+            headers["content-length"] = str(length)
+        self.init_headers(headers)
+
+    @property
+    def _closing(self) -> bytes:
+        return f"--{self.boundary}--\r\n".encode("latin-1")
+
+    def _if_range_ok(self, if_range: str, mtime: float) -> bool:
+        """If-Range holds when it names our current strong ETag or exact Last-Modified date."""
+        if_range = if_range.strip()
+        if if_range.startswith('"') or if_range.startswith("W/"):
+            return if_range == self.etag
+        try:
+            return int(parsedate_to_datetime(if_range).timestamp()) == int(mtime)
+        except (TypeError, ValueError):
+            return False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope["method"].upper() == "HEAD" or self.status_code in (304, 416):
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        extensions = scope.get("extensions") or {}
+        if self.status_code == 200 and "http.response.pathsend" in extensions:
+            await send({"type": "http.response.pathsend", "path": os.path.abspath(self.path)})
+            return
+
+        zerocopy = "http.response.zerocopysend" in extensions
+        with open(self.path, "rb") as f:
+            if not self.ranges:
+                await self._send_span(send, f, 0, self.file_size - 1, zerocopy, more_body=False)
+            elif not self.boundary:
+                start, end = self.ranges[0]
+                await self._send_span(send, f, start, end, zerocopy, more_body=False)
+            else:
+                for head, start, end in self.parts:
+                    await send({"type": "http.response.body", "body": head, "more_body": True})
+                    await self._send_span(send, f, start, end, zerocopy, more_body=True)
+                    await send({"type": "http.response.body", "body": b"\r\n", "more_body": True})
+                await send({"type": "http.response.body", "body": self._closing, "more_body": False})
+
+    async def _send_span(self, send: Send, f, start: int, end: int, zerocopy: bool, more_body: bool):
+        count = end - start + 1
+        if zerocopy:
+            await send({
+                "type": "http.response.zerocopysend",
+                "file": f,
+                "offset": start,
+                "count": count,
+                "more_body": more_body,
+            })
+            return
+
+        fd = f.fileno()
+        offset = start
+        while count > 0:
+            chunk = await anyio.to_thread.run_sync(os.pread, fd, min(CHUNK_SIZE, count), offset)
+            if not chunk:
+                break
+            offset += len(chunk)
+            count -= len(chunk)
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body or count > 0})
+        if count > 0:
+            # file shrank underneath us: terminate the body
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
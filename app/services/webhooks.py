@@ -0,0 +1,66 @@
+import os
+import hmac
+import time
+import base64
+import hashlib
+from typing import Mapping, Optional
+from urllib.parse import urlencode
+
+# Completion callbacks are registered with providers only when both are set
+PUBLIC_BASE_URL = os.getenv("PUBLIC_BASE_URL", "").rstrip("/")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+# Replicate signs its webhooks itself (Standard Webhooks); verified too when this is set
+REPLICATE_WEBHOOK_SECRET = os.getenv("REPLICATE_WEBHOOK_SECRET", "")
+WEBHOOK_TOLERANCE = 300  # seconds of clock skew accepted on signed timestamps
+
+
+def enabled() -> bool:
+    return bool(PUBLIC_BASE_URL and WEBHOOK_SECRET)
+
+
+def _token(provider: str, job_id: str) -> str:
+    return hmac.new(WEBHOOK_SECRET.encode(), f"{provider}:{job_id}".encode(), hashlib.sha256).hexdigest()
+
+
+def webhook_url(provider: str, job_id: str) -> Optional[str]:
+    """
+    Callback URL for one job, or None when webhooks are off.
+    The `sig` query parameter is an HMAC of provider and job id, so a callback can only
+    ever update the job it was issued for, whichever provider sends it.
+    """
+    if not enabled():
+        return None
+    query = urlencode({"job": job_id, "sig": _token(provider, job_id)})
+    return f"{PUBLIC_BASE_URL}/webhooks/{provider}?{query}"
+
+
+def verify_token(provider: str, job_id: str, sig: str) -> bool:
+    return bool(WEBHOOK_SECRET) and hmac.compare_digest(_token(provider, job_id), sig or "")
+
+
+def sign_standard(secret: str, msg_id: str, timestamp: str, body: bytes) -> str:
+    """Standard Webhooks signature ("v1,<base64 HMAC-SHA256>") as sent by Replicate."""
+    key = base64.b64decode(secret[len("whsec_"):] if secret.startswith("whsec_") else secret)
+    digest = hmac.new(key, f"{msg_id}.{timestamp}.".encode() + body, hashlib.sha256).digest()
+    return "v1," + base64.b64encode(digest).decode()
+
+
+def verify_standard(secret: str, headers: Mapping[str, str], body: bytes) -> bool:
+    msg_id = headers.get("webhook-id", "")
+    timestamp = headers.get("webhook-timestamp", "")
+    try:
+        if abs(time.time() - int(timestamp)) > WEBHOOK_TOLERANCE:
+            return False
+    except ValueError:
+        return False
+    expected = sign_standard(secret, msg_id, timestamp, body)
+    # the header may carry several space-separated signatures during key rotation
+    return any(hmac.compare_digest(expected, s) for s in headers.get("webhook-signature", "").split())
+
+
+def verify(provider: str, job_id: str, sig: str, headers: Mapping[str, str], body: bytes) -> bool:
+    if not verify_token(provider, job_id, sig):
+        return False
+    if provider == "replicate" and REPLICATE_WEBHOOK_SECRET:
+        return verify_standard(REPLICATE_WEBHOOK_SECRET, headers, body)
+    return True
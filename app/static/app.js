@@ -0,0 +1,156 @@
+async function generate() {
+  let prompt = document.getElementById('optimized-output').value.trim();
+  if (!prompt) {
+    // fallback if optimized section is empty
+    prompt = document.getElementById('prompt').value.trim();
+  }
+
+  const style = document.getElementById('style').value;
+  if (!prompt) { alert("Please enter a prompt"); return; }
+
+  setStatus("Submitting…");
+  toggleLoading(true);
+
+  const res = await fetch('/generate', {
+    method: 'POST', headers: {'Content-Type':'application/json'},
+    body: JSON.stringify({prompt, style})
+  });
+  if (res.status === 503) {
+    const wait = res.headers.get('Retry-After') || 'a few';
+    setStatus(`Busy right now, try again in ${wait} seconds.`);
+    toggleLoading(false);
+    return;
+  }
+  const data = await res.json();
+  if (!data.job_id) { setStatus("Error submitting job."); toggleLoading(false); return; }
+
+  if (data.status === 'succeeded' && data.video_url) {
+    setStatus("🧠Cached result ready⏳");
+    showVideo(data.video_url, data.job_id);
+    toggleLoading(false);
+    return;
+  }
+  setStatus("Generating Video… please wait 😇");
+  // A job token can be answered by any server instance; the job id only by the one that queued it
+  watch(data.job_token || data.job_id);
+}
+
+function setStatus(text) {
+  document.getElementById('status').innerText = text;
+}
+
+function toggleLoading(show) {
+  document.querySelector('.loading-bar').style.display = show ? 'block' : 'none';
+}
+
+function showVideo(url, jobId) {
+  const resultDiv = document.getElementById('result');
+  const videoId = jobId || Date.now().toString(); // job id groups feedback per video
+
+  resultDiv.innerHTML = `
+    <p class="fade-in">Done ✔️</p>
+    <video controls autoplay loop class="fade-in" style="width:100%;max-width:720px;border-radius:12px;margin-top:1rem;box-shadow:0 6px 18px rgba(0,0,0,0.2);">
+      <source src="${url}" type="video/mp4">
+    </video>
+    <div id="download-section" class="fade-in">
+      <p>🎬 Liked this video ? Why not keep it with you 😉</p>
+      <a href="${url}" download="peppo-video.mp4">
+        <button>⬇️ Download Video</button>
+      </a>
+    </div>
+    <div id="feedback-section" class="fade-in" style="margin-top:1rem;">
+      <p>👍 Did you like this generation?</p>
+      <div id="feedback-buttons">
+        <button onclick="sendFeedback('${videoId}', true)">👍 Yes</button>
+        <button onclick="sendFeedback('${videoId}', false)">👎 No</button>
+      </div>
+      <p id="feedback-msg" style="margin-top:.5rem;color:#444;"></p>
+    </div>
+  `;
+}
+
+function handleStatus(d) {
+  if (d.status === 'succeeded' && d.video_url) {
+    setStatus(d.cached ? "Done (from cache) ✓" : "");
+    toggleLoading(false);
+    showVideo(d.video_url, d.job_id);
+    return true;
+  } else if (d.status === 'failed') {
+    toggleLoading(false);
+    setStatus("Generation failed" + (d.error ? `: ${d.error}` : ""));
+    return true;
+  } else if (d.status === 'queued' && d.queue) {
+    setStatus(`Queued (${d.queue.depth} waiting)… please wait 😇`);
+  } else if (d.status === 'processing') {
+    setStatus("Generating Video… please wait 😇");
+  }
+  return false;
+}
+
+function watch(jobId) {
+  // Server pushes status changes; fall back to polling without EventSource
+  if (!window.EventSource) { poll(jobId); return; }
+
+  const es = new EventSource(`/events/${jobId}`);
+  let done = false;
+  es.addEventListener('status', (e) => {
+    if (handleStatus(JSON.parse(e.data))) { done = true; es.close(); }
+  });
+  es.onerror = () => {
+    es.close();
+    if (!done) poll(jobId);
+  };
+}
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+async function poll(jobId) {
+  // Long-poll: with ?since= the server answers as soon as the job's version changes
+  let since = null;
+  while (true) {
+    const r = await fetch(`/status/${jobId}` + (since === null ? '' : `?since=${since}`));
+    if (!r.ok) { await sleep(1500); continue; }
+    const d = await r.json();
+    if (handleStatus(d)) return;
+    if (d.version === undefined) await sleep(1500);  // answered by the provider: nothing to wait on
+    since = d.version ?? null;
+  }
+}
+
+document.getElementById('go').addEventListener('click', generate);
+
+document.getElementById('optimize').addEventListener('click', async () => {
+  const prompt = document.getElementById('prompt').value.trim();
+  const style = document.getElementById('style').value;
+  if (!prompt) { alert("Please enter a prompt first"); return; }
+
+  setStatus("Optimizing prompt…");
+  const res = await fetch('/optimize_prompt', {
+    method: 'POST',
+    headers: {'Content-Type': 'application/json'},
+    body: JSON.stringify({ prompt, style })
+  });
+  const data = await res.json();
+
+  const optimizedBox = document.getElementById('optimized-output');
+  optimizedBox.value = data.optimized_prompt;
+  optimizedBox.style.display = 'block';
+  setStatus("Prompt optimized ✔️");
+});
+
+
+async function sendFeedback(videoId, liked) {
+  // Disable buttons immediately
+  const feedbackButtons = document.getElementById('feedback-buttons');
+  if (feedbackButtons) feedbackButtons.style.display = "none";
+
+  // Send feedback request
+  const res = await fetch('/feedback', {
+    method: 'POST',
+    headers: {'Content-Type': 'application/json'},
+    body: JSON.stringify({ video_id: videoId, liked })
+  });
+
+  const data = await res.json();
+  document.getElementById('feedback-msg').innerText = "✅ Thank you for your feedback!";
+}
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark of the app against the mock provider, fully in-process.
+
+Simulated clients arrive at a target rate, each doing POST /generate, polling
+GET /status until the job finishes, then a ranged GET /video. Prints (and
+optionally saves) a JSON report with p50/p95/p99 latencies, throughput and
+upstream call counts, and can compare it against a stored baseline:
+
+    python test_scripts/benchmark.py --rps 20 --duration 15 --out bench.json
+    python test_scripts/benchmark.py --rps 20 --duration 15 --baseline bench.json
+
+Exits with status 1 when a metric regresses by more than --tolerance.
+
+--provider simulator uses the in-process SimulatorProvider; replicate and modelslab
+run the real provider code against test_scripts/provider_stub.py on a local port.
+Failure injection comes from the SIM_* variables (SIM_FAIL_RATE, SIM_THROTTLE, ...).
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--provider", default="mock", choices=["mock", "simulator", "replicate", "modelslab"])
+    p.add_argument("--rps", type=float, default=10.0, help="new generation requests per second")
+    p.add_argument("--duration", type=float, default=10.0, help="seconds to keep issuing requests")
+    p.add_argument("--clients", type=int, default=200, help="max simulated clients in flight")
+    p.add_argument("--latency", default="lognormal:2,0.4",
+                   help="mock generation time: seconds, uniform:LO,HI, lognormal:MEDIAN,SIGMA or exp:MEAN")
+    p.add_argument("--repeat-ratio", type=float, default=0.3,
+                   help="share of requests reusing an earlier prompt (exercises the prompt cache)")
+    p.add_argument("--status-interval", type=float, default=0.25, help="client /status poll interval")
+    p.add_argument("--long-poll", action="store_true", help="poll /status?since=<version> instead of on an interval")
+    p.add_argument("--range-bytes", type=int, default=256 * 1024, help="size of the /video range read (0 skips it)")
+    p.add_argument("--job-timeout", type=float, default=300.0, help="give up on a job after this many seconds")
+    p.add_argument("--seed", type=int, default=1234)
+    p.add_argument("--out", help="write the JSON report here")
+    p.add_argument("--baseline", help="compare against this JSON report")
+    p.add_argument("--tolerance", type=float, default=0.25, help="allowed relative regression vs the baseline")
+    return p.parse_args()
+
+
+args = parse_args()
+
+
+# Configure the app before importing it: mock provider, in-memory state, no rate limiting in the way
+os.environ.update({
+    "VIDEO_PROVIDER": args.provider,
+    "VIDEO_PROVIDERS": args.provider,
+    "MOCK_LATENCY": args.latency,
+    "MOCK_SEED": str(args.seed),
+    "SIM_LATENCY": args.latency,
+    "SIM_SEED": str(args.seed),
+    "JOB_STORE": "memory",
+    "VIDEO_CACHE_DIR": "",
+    "SUBMIT_RATE": "100000",
+    "SUBMIT_BURST": "100000",
+    "PROVIDER_MAX_INFLIGHT": "100000",
+    "SCHEDULER_MAX_QUEUE": "100000",
+    "PUBLIC_BASE_URL": "",
+    "SERVER_TIMING": "0",
+})
+os.environ.setdefault("POLL_INTERVAL", "0.5")
+
+import httpx
+
+stub = None
+if args.provider in ("replicate", "modelslab"):
+    import socket
+    import uvicorn
+    from provider_stub import build_app
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    stub = build_app()
+    server = uvicorn.Server(uvicorn.Config(stub, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    os.environ.update({
+        "REPLICATE_BASE_URL": f"http://127.0.0.1:{port}",
+        "REPLICATE_API_TOKEN": "stub",
+        "MODELSLAB_API_URL": f"http://127.0.0.1:{port}/v1/video",
+    })
+
+from app.main import app, video_gen
+
+
+def percentiles(samples):
+    if not samples:
+        return {"count": 0}
+    s = sorted(samples)
+
+    def pct(q):
+        return round(s[min(int(q * len(s)), len(s) - 1)] * 1000, 2)
+
+    return {"count": len(s), "p50_ms": pct(0.50), "p95_ms": pct(0.95), "p99_ms": pct(0.99),
+            "max_ms": round(s[-1] * 1000, 2)}
+
+
+async def run() -> dict:
+    rng = random.Random(args.seed)
+    timings = {"generate": [], "status": [], "video": [], "completion": []}
+    errors = {}
+    completed = 0
+    prompts = []
+
+    await app.router.startup()
+    transport = httpx.ASGITransport(app=app)
+    sem = asyncio.Semaphore(args.clients)
+
+    async def client(i: int, http: httpx.AsyncClient):
+        nonlocal completed
+        if prompts and rng.random() < args.repeat_ratio:
+            prompt = rng.choice(prompts)
+        else:
+            prompt = f"benchmark scene {args.seed}-{i}: a fox running through snow"
+            prompts.append(prompt)
+
+        async with sem:
+            started = time.perf_counter()
+            t = time.perf_counter()
+            r = await http.post("/generate", json={"prompt": prompt, "style": rng.choice(["cinematic", "anime", "product"])})
+            timings["generate"].append(time.perf_counter() - t)
+            if r.status_code != 200:
+                errors[f"generate_{r.status_code}"] = errors.get(f"generate_{r.status_code}", 0) + 1
+                return
+            body = r.json()
+            while body.get("status") in ("queued", "processing"):
+                if time.perf_counter() - started > args.job_timeout:
+                    errors["timeout"] = errors.get("timeout", 0) + 1
+                    return
+                if not args.long_poll:
+                    await asyncio.sleep(args.status_interval)
+                query = f"?since={body['version']}" if args.long_poll else ""
+                t = time.perf_counter()
+                r = await http.get(f"/status/{body['job_id']}{query}")
+                timings["status"].append(time.perf_counter() - t)
+                body = r.json()
+            if body.get("status") != "succeeded":
+                errors[body.get("status", "unknown")] = errors.get(body.get("status", "unknown"), 0) + 1
+                return
+            timings["completion"].append(time.perf_counter() - started)
+            completed += 1
+
+            if args.range_bytes:
+                t = time.perf_counter()
+                r = await http.get(body["video_url"], headers={"Range": f"bytes=0-{args.range_bytes - 1}"})
+                timings["video"].append(time.perf_counter() - t)
+                if r.status_code not in (206, 307):  # 307: redirected to the provider's URL
+                    errors[f"video_{r.status_code}"] = errors.get(f"video_{r.status_code}", 0) + 1
+
+    tasks = []
+    began = time.perf_counter()
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as http:
+        n = 0
+        while time.perf_counter() - began < args.duration:
+            tasks.append(asyncio.create_task(client(n, http)))
+            n += 1
+            await asyncio.sleep(rng.expovariate(args.rps))  # Poisson arrivals
+        await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - began
+    await app.router.shutdown()
+
+    calls = dict(stub.state.upstream.calls if stub else video_gen.providers[args.provider].calls)
+    return {
+        "config": {k: getattr(args, k) for k in ("provider", "rps", "duration", "clients", "latency", "repeat_ratio",
+                                                 "status_interval", "long_poll", "range_bytes", "seed")},
+        "requests": len(tasks),
+        "completed": completed,
+        "errors": errors,
+        "throughput_rps": round(completed / elapsed, 2),
+        "latency": {name: percentiles(samples) for name, samples in timings.items()},
+        "upstream": {
+            **calls,
+            "fetch_per_job": round(calls["fetch"] / calls["submit"], 2) if calls["submit"] else 0.0,
+        },
+        "saved_generations": dict(video_gen.savings),
+    }
+
+
+def compare(report: dict, baseline: dict, tolerance: float):
+    """Relative regressions beyond `tolerance`: higher latencies or fetches per job, lower throughput."""
+    regressions = []
+    for name, stats in baseline.get("latency", {}).items():
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            old, new = stats.get(key), report["latency"].get(name, {}).get(key)
+            if old and new is not None and new > old * (1 + tolerance):
+                regressions.append(f"{name}.{key}: {old} -> {new}")
+    old, new = baseline.get("throughput_rps"), report["throughput_rps"]
+    if old and new < old * (1 - tolerance):
+        regressions.append(f"throughput_rps: {old} -> {new}")
+    old, new = baseline.get("upstream", {}).get("fetch_per_job"), report["upstream"]["fetch_per_job"]
+    if old and new > old * (1 + tolerance):
+        regressions.append(f"upstream.fetch_per_job: {old} -> {new}")
+    return regressions
+
+
+if __name__ == "__main__":
+    report = asyncio.run(run())
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print("❌ Regressions vs baseline:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+        print("✅ No regressions vs baseline")
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Local HTTP stand-in for the Replicate and ModelsLab APIs, backed by SimulatedUpstream
+(app/providers/simulator.py), so the real provider code paths can be exercised offline.
+
+    python test_scripts/provider_stub.py --port 9000 --latency lognormal:8,0.5 --throttle 60,5
+
+    # then, for the app
+    REPLICATE_BASE_URL=http://127.0.0.1:9000 REPLICATE_API_TOKEN=stub \\
+    MODELSLAB_API_URL=http://127.0.0.1:9000/v1/video \\
+    VIDEO_PROVIDERS=replicate,modelslab uvicorn app.main:app
+
+Replicate: POST /v1/models/{owner}/{name}/predictions, POST /v1/predictions, GET /v1/predictions/{id}
+ModelsLab: POST /v1/video/text2video, GET|POST /v1/video/fetch/{id}
+Outputs:   GET /files/{id}.mp4?expires=... (403 once expired)
+
+Both protocols honour the prompt's "webhook" field and call it back on completion.
+"""
+import os
+import sys
+import time
+import asyncio
+import logging
+import argparse
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import FileResponse, JSONResponse
+from app.providers.simulator import SimulatedUpstream
+
+PLACEHOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app", "static", "placeholder.mp4")
+log = logging.getLogger("provider_stub")
+
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def build_app(upstream: Optional[SimulatedUpstream] = None) -> FastAPI:
+    upstream = upstream or SimulatedUpstream()
+    app = FastAPI(title="Provider stub")
+    app.state.upstream = upstream
+    tasks = set()
+
+    def output_url(request: Request, job: Dict) -> str:
+        url = f"{str(request.base_url).rstrip('/')}/files/{job['id']}.mp4"
+        expires = upstream.expires(job)
+        return f"{url}?expires={expires}" if expires else url
+
+    def rejection(fault) -> JSONResponse:
+        code, retry_after = fault
+        if code == 429:
+            # Replicate's wording; its SDK parses the wait out of `detail`
+            detail = f"Request was throttled. Expected available in {int(retry_after) + 1} seconds."
+            return JSONResponse({"title": "Request was throttled", "detail": detail, "status": 429},
+                                status_code=429, headers={"Retry-After": str(int(retry_after) + 1)})
+        return JSONResponse({"title": "Service unavailable", "detail": "Simulated upstream error", "status": code},
+                            status_code=code)
+
+    def prediction(request: Request, job: Dict) -> Dict:
+        status = upstream.status(job)
+        done = status in ("succeeded", "failed")
+        base = str(request.base_url).rstrip("/")
+        return {
+            "id": job["id"],
+            "model": job["input"].get("_model", "stub/simulated"),
+            "version": "simulated",
+            "status": status,
+            "input": {k: v for k, v in job["input"].items() if not k.startswith("_")},
+            "output": output_url(request, job) if status == "succeeded" else None,
+            "logs": "",
+            "error": "Simulated generation failure" if status == "failed" else None,
+            "metrics": {"predict_time": round(job["latency"], 3)} if done else {},
+            "created_at": _iso(job["created"]),
+            "started_at": _iso(job["created"]),
+            "completed_at": _iso(job["created"] + job["latency"]) if done else None,
+            "urls": {"get": f"{base}/v1/predictions/{job['id']}", "cancel": f"{base}/v1/predictions/{job['id']}/cancel"},
+        }
+
+    def modelslab_result(request: Request, job: Dict) -> Dict:
+        status = upstream.status(job)
+        if status == "succeeded":
+            url = output_url(request, job)
+            return {"status": "success", "id": job["id"], "output": [url], "output_url": url}
+        if status == "failed":
+            return {"status": "error", "id": job["id"], "message": "Simulated generation failure"}
+        return {"status": "processing", "id": job["id"],
+                "eta": max(round(job["ready_at"] - time.monotonic()), 0)}
+
+    def call_back(url: Optional[str], job: Dict, render):
+        """POST `render()` to the job's webhook once it finishes (stuck jobs never call back)."""
+        if not url or job["outcome"] == "stuck":
+            return
+
+        async def deliver():
+            await asyncio.sleep(max(job["ready_at"] - time.monotonic(), 0))
+            try:
+                async with httpx.AsyncClient(timeout=10) as client:
+                    await client.post(url, json=render())
+            except Exception as e:
+                log.warning("Webhook delivery for %s failed: %s", job["id"], e)
+
+        task = asyncio.get_running_loop().create_task(deliver())
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    async def create_prediction(request: Request, model: str):
+        await asyncio.sleep(upstream.submit_delay())
+        fault = upstream.fault()
+        if fault:
+            return rejection(fault)
+        body = await request.json()
+        job = upstream.create({**(body.get("input") or {}), "_model": model})
+        call_back(body.get("webhook"), job, lambda: prediction(request, job))
+        return JSONResponse(prediction(request, job), status_code=201)
+
+    # ---- Replicate ----
+
+    @app.post("/v1/models/{owner}/{name}/predictions")
+    async def replicate_model_create(owner: str, name: str, request: Request):
+        return await create_prediction(request, f"{owner}/{name}")
+
+    @app.post("/v1/predictions")
+    async def replicate_create(request: Request):
+        return await create_prediction(request, "stub/simulated")
+
+    @app.get("/v1/predictions/{job_id}")
+    async def replicate_get(job_id: str, request: Request):
+        fault = upstream.fault(throttle=False)
+        if fault:
+            return rejection(fault)
+        job = upstream.get(job_id)
+        if job is None:
+            return JSONResponse({"title": "Not found", "detail": "Prediction not found", "status": 404}, status_code=404)
+        return prediction(request, job)
+
+    # ---- ModelsLab ----
+
+    @app.post("/v1/video/text2video")
+    async def modelslab_create(request: Request):
+        await asyncio.sleep(upstream.submit_delay())
+        fault = upstream.fault()
+        if fault:
+            return rejection(fault)
+        body = await request.json()
+        job = upstream.create(body)
+        call_back(body.get("webhook"), job, lambda: modelslab_result(request, job))
+        base = str(request.base_url).rstrip("/")
+        return {"status": "processing", "id": job["id"], "fetch_url": f"{base}/v1/video/fetch/{job['id']}",
+                "output_url": None, "eta": round(job["latency"])}
+
+    @app.api_route("/v1/video/fetch/{job_id}", methods=["GET", "POST"])
+    async def modelslab_fetch(job_id: str, request: Request):
+        fault = upstream.fault(throttle=False)
+        if fault:
+            return rejection(fault)
+        job = upstream.get(job_id)
+        if job is None:
+            return {"status": "error", "message": "Request not found"}
+        return modelslab_result(request, job)
+
+    # ---- Outputs ----
+
+    @app.get("/files/{job_id}.mp4")
+    async def output_file(job_id: str, expires: int = 0):
+        if expires and time.time() > expires:
+            return JSONResponse({"detail": "URL expired"}, status_code=403)
+        return FileResponse(PLACEHOLDER, media_type="video/mp4")
+
+    @app.get("/stats")
+    async def stats():
+        return upstream.calls
+
+    return app
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=9000)
+    p.add_argument("--latency", help="generation time spec (default SIM_LATENCY)")
+    p.add_argument("--submit-latency", help="submit call time spec (default SIM_SUBMIT_LATENCY)")
+    p.add_argument("--seed", type=int, help="default SIM_SEED")
+    p.add_argument("--fail-rate", type=float, help="default SIM_FAIL_RATE")
+    p.add_argument("--stuck-rate", type=float, help="default SIM_STUCK_RATE")
+    p.add_argument("--throttle", help="PERIOD,LENGTH of 429 windows (default SIM_THROTTLE)")
+    p.add_argument("--errors", help="PERIOD,LENGTH of 503 windows (default SIM_ERRORS)")
+    p.add_argument("--url-ttl", type=float, help="seconds output URLs stay valid (default SIM_URL_TTL)")
+    args = p.parse_args()
+
+    import uvicorn
+    upstream = SimulatedUpstream(latency=args.latency, submit_latency=args.submit_latency, seed=args.seed,
+                                 fail_rate=args.fail_rate, stuck_rate=args.stuck_rate, throttle=args.throttle,
+                                 errors=args.errors, url_ttl=args.url_ttl)
+    uvicorn.run(build_app(upstream), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for the serverless entry point (api/main.py).
+
+Each run is a fresh interpreter, like a Vercel cold start. It measures the time to
+import the app, the time until the first responses to GET /healthz and GET / complete,
+peak RSS, and whether the heavy SDKs (openai, replicate, requests) were loaded.
+Prints medians over --runs as JSON.
+
+    python test_scripts/startup_benchmark.py --runs 10
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r"""
+import time, sys, json, resource, asyncio
+t0 = time.perf_counter()
+from api.main import app
+t_import = time.perf_counter() - t0
+
+import httpx
+
+async def first_responses():
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://cold") as client:
+        h = await client.get("/healthz")
+        t_health = time.perf_counter() - t0
+        i = await client.get("/")
+        t_index = time.perf_counter() - t0
+        return h.status_code, t_health, i.status_code, t_index
+
+h_status, t_health, i_status, t_index = asyncio.run(first_responses())
+print(json.dumps({
+    "import_s": t_import,
+    "first_healthz_s": t_health,
+    "first_index_s": t_index,
+    "status": [h_status, i_status],
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "heavy_modules": [m for m in ("openai", "replicate", "requests") if m in sys.modules],
+}))
+"""
+
+
+def run_once(env) -> dict:
+    started = time.perf_counter()
+    out = subprocess.run([sys.executable, "-c", CHILD], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    result["process_s"] = time.perf_counter() - started  # includes interpreter startup
+    return result
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--runs", type=int, default=5)
+    p.add_argument("--provider", default=os.getenv("VIDEO_PROVIDER", "replicate"))
+    args = p.parse_args()
+
+    env = dict(os.environ, VIDEO_PROVIDER=args.provider, VIDEO_PROVIDERS=args.provider,
+               PYTHONPATH=ROOT, PYTHONDONTWRITEBYTECODE="0")
+    run_once(env)  # warm the bytecode cache, as a deployed bundle would have it
+    runs = [run_once(env) for _ in range(args.runs)]
+
+    def median(key):
+        return round(statistics.median(r[key] for r in runs) * (1000 if key.endswith("_s") else 1), 1)
+
+    print(json.dumps({
+        "runs": args.runs,
+        "provider": args.provider,
+        "import_ms": median("import_s"),
+        "first_healthz_ms": median("first_healthz_s"),
+        "first_index_ms": median("first_index_s"),
+        "process_ms": median("process_s"),
+        "max_rss_mb": median("max_rss_mb"),
+        "status": runs[-1]["status"],
+        "heavy_modules": runs[-1]["heavy_modules"],
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
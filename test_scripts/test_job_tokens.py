@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Signed job tokens: round trip, and tampered, expired or malformed tokens are
+refused, with /status answering 404 rather than 500 for the malformed ones.
+No API keys needed.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.update({
+    "VIDEO_PROVIDER": "mock",
+    "JOB_TOKEN_SECRET": "local-test-secret",
+    "JOB_STORE": "memory",
+    "VIDEO_CACHE_DIR": "",
+})
+
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services import job_tokens
+
+print("🧪 Testing signed job tokens...")
+print("=" * 50)
+
+ok = True
+
+
+def check(label: str, passed: bool):
+    global ok
+    ok = ok and passed
+    print(f"{'✅' if passed else '❌'} {label}")
+
+
+token = job_tokens.issue("mock", "up|1", "hash", "my style/é")
+decoded = job_tokens.decode(token)
+check("round trip", decoded is not None and decoded[:4] == ("mock", "up|1", "hash", "my style/é"))
+check("tampered signature refused", job_tokens.decode(token[:-1] + ("A" if token[-1] != "A" else "B")) is None)
+check("expired token refused", job_tokens.decode(job_tokens.issue("mock", "x", "h", "anime", issued=time.time() - job_tokens.JOB_TOKEN_TTL - 1)) is None)
+
+malformed = ["jt.", "jt.abc", "jt.abc.é", "jt.é.abc", "jt.abc.\ud800", "jt.!!!." + job_tokens._sign("!!!")]
+for bad in malformed:
+    try:
+        check(f"malformed {bad!r} refused", job_tokens.decode(bad) is None)
+    except Exception as e:
+        check(f"malformed {bad!r} refused (raised {type(e).__name__})", False)
+
+with TestClient(app) as client:
+    for bad in ["jt.abc.é", "jt.abc", "jt.%FF.x"]:
+        r = client.get(f"/status/{bad}")
+        check(f"/status/{bad} -> {r.status_code}", r.status_code == 404)
+
+print("✅ All token checks passed" if ok else "❌ Some token checks failed")
+sys.exit(0 if ok else 1)
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Two workers sharing one SQLite job store: worker A submits more jobs than its
+provider in-flight cap allows, while worker B holds the poll leases and sees every
+job finish. A must notice the finished jobs in the store, free its slots and
+dispatch the rest of its queue. No API keys needed.
+"""
+import os
+import sys
+import time
+import asyncio
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.update({
+    "PROVIDER_MAX_INFLIGHT": "3",
+    "SUBMIT_RATE": "1000",
+    "SUBMIT_BURST": "1000",
+    "POLL_MIN_INTERVAL": "0.1",
+    "POLL_MAX_INTERVAL": "0.5",
+    "VIDEO_CACHE_DIR": "",
+})
+
+from app.providers.simulator import SimulatedUpstream, SimulatorProvider
+from app.services.sqlite_jobs import SQLiteJobStore
+from app.services.video_generator import VideoGenerator
+
+JOBS = 6
+
+
+async def main() -> bool:
+    path = os.path.join(tempfile.mkdtemp(), "jobs.db")
+    upstream = SimulatedUpstream(latency="0.5", seed=1)  # one upstream, as both workers would see it
+    a = VideoGenerator({"simulator": SimulatorProvider(upstream)}, store=SQLiteJobStore(path))
+    b = VideoGenerator({"simulator": SimulatorProvider(upstream)}, store=SQLiteJobStore(path))
+
+    # B polls continuously and so holds the leases; A only dispatches and runs its own
+    # poll cycles by hand, which never get a lease while B renews them
+    b.start_poller(interval=0.05)
+    a.scheduler.start()
+    recs = [await a.asubmit(f"shared store job {i} {time.time()}", "anime") for i in range(JOBS)]
+    await asyncio.sleep(0.5)  # B's first cycles lease every job
+
+    deadline = time.monotonic() + 20
+    while time.monotonic() < deadline:
+        await a.poll_once()
+        if (all(a.store.get(r.job_id).status == "succeeded" for r in recs)
+                and a.scheduler.stats("simulator")["inflight"] == 0):
+            break
+        await asyncio.sleep(0.1)
+
+    statuses = [a.store.get(r.job_id).status for r in recs]
+    inflight = a.scheduler.stats("simulator")["inflight"]
+    print(f"A's jobs: {statuses}")
+    print(f"A's in-flight slots: {inflight}, polls by A: {a.poll_stats['fetches']}, by B: {b.poll_stats['fetches']}")
+    await a.aclose()
+    await b.aclose()
+    return statuses == ["succeeded"] * JOBS and inflight == 0
+
+
+if __name__ == "__main__":
+    print("🧪 Testing provider slots across two workers on one SQLite store...")
+    print("=" * 50)
+    ok = asyncio.run(main())
+    print("✅ A released its slots for jobs B saw finish" if ok else "❌ A's slots stayed taken")
+    sys.exit(0 if ok else 1)